@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark de la clasificación de fuentes (nlm_sources.classify_sources).
+Clasifica N entradas mezcladas (YouTube, Drive, URLs, dominios, rutas que
+existen y que no, textos) y lo compara con la detección anterior basada en
+listas de regex y Path.exists() para cada entrada, y con detect_source_type
+entrada a entrada. Comprueba además que todas den el mismo tipo.
+
+Uso:
+  python benchmarks/bench_classify.py [--n 100000] [--runs 5] [--max-us 5]
+"""
+
+import argparse
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+from nlm_sources import FILE_EXTENSIONS, classify_sources, detect_source_type  # noqa: E402
+
+# === Detección anterior (referencia) ===
+
+_LEGACY_YOUTUBE = [
+    re.compile(r"(?:https?://)?(?:www\.)?youtube\.com/watch\?v=[\w-]+"),
+    re.compile(r"(?:https?://)?youtu\.be/[\w-]+"),
+    re.compile(r"(?:https?://)?(?:www\.)?youtube\.com/shorts/[\w-]+"),
+]
+_LEGACY_DRIVE = [
+    re.compile(r"(?:https?://)?drive\.google\.com/"),
+    re.compile(r"(?:https?://)?docs\.google\.com/"),
+]
+
+
+def _legacy_detect(source: str) -> str:
+    for pattern in _LEGACY_YOUTUBE:
+        if pattern.search(source):
+            return "youtube"
+    for pattern in _LEGACY_DRIVE:
+        if pattern.search(source):
+            return "drive"
+    if source.startswith(("http://", "https://")):
+        return "url"
+    path = Path(source).expanduser()
+    try:
+        exists = path.exists()
+    except OSError:  # la versión anterior fallaba aquí con textos de más de 255 bytes
+        exists = False
+    if exists or path.suffix.lower() in FILE_EXTENSIONS:
+        return "file"
+    if len(source) > 200:
+        return "text"
+    if "." in source and " " not in source:
+        return "url"
+    return "text"
+
+
+# === Entradas ===
+
+def make_inputs(n: int, files_dir: Path, seed: int = 0) -> list[str]:
+    """N entradas mezcladas, reproducibles con `seed`."""
+    rng = random.Random(seed)
+    existing = []
+    for i in range(20):
+        path = files_dir / f"apuntes_{i}.pdf"
+        path.write_text("x")
+        existing.append(str(path))
+    (files_dir / "sin_extension").write_text("x")
+    existing.append(str(files_dir / "sin_extension"))
+
+    words = "tema clase examen resumen capítulo notas fuente práctica".split()
+    makers = [
+        lambda i: f"https://www.youtube.com/watch?v=vid{i:07d}",
+        lambda i: f"https://youtu.be/v{i:07d}",
+        lambda i: f"https://drive.google.com/file/d/F{i:010d}/view",
+        lambda i: f"https://docs.google.com/document/d/D{i:010d}/edit",
+        lambda i: f"https://example.com/articulo/{i}",
+        lambda i: f"blog{i % 500}.example.org/post/{i}",
+        lambda i: f"dominio{i % 500}.com",
+        lambda i: rng.choice(existing),
+        lambda i: f"{files_dir}/no_existe_{i}.docx",
+        lambda i: f"~/cursos/tema{i % 50}/material_{i}",
+        lambda i: " ".join(rng.choice(words) for _ in range(8)),
+        lambda i: " ".join(rng.choice(words) for _ in range(60)),
+    ]
+    return [makers[i % len(makers)](i) for i in range(n)]
+
+
+def _time(fn, inputs: list[str]) -> float:
+    start = time.perf_counter()
+    fn(inputs)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de clasificación de fuentes")
+    parser.add_argument("--n", type=int, default=100_000, help="Entradas a clasificar (default: 100000)")
+    parser.add_argument("--runs", type=int, default=5, help="Repeticiones (default: 5)")
+    parser.add_argument("--max-us", type=float,
+                        help="Fallar si classify_sources tarda más de N µs por entrada (mediana)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        inputs = make_inputs(args.n, Path(tmp))
+
+        current = dict(classify_sources(inputs))
+        mismatches = [s for s in inputs if current[s] != _legacy_detect(s) or current[s] != detect_source_type(s)]
+
+        cases = {
+            "classify_sources": lambda xs: list(classify_sources(xs)),
+            "detect_source_type": lambda xs: [detect_source_type(x) for x in xs],
+            "anterior": lambda xs: [_legacy_detect(x) for x in xs],
+        }
+        results = {}
+        for name, fn in cases.items():
+            fn(inputs[:1000])
+            results[name] = statistics.median(_time(fn, inputs) for _ in range(args.runs))
+
+    print(f"CLASIFICACIÓN ({args.n} entradas, {args.runs} ejecuciones, mediana):")
+    for name, seconds in results.items():
+        print(f"  {name:<18} {seconds * 1000:9.1f} ms  {seconds / args.n * 1e6:6.2f} µs/entrada")
+    print(f"\n  Aceleración: x{results['anterior'] / results['classify_sources']:.1f}")
+
+    if mismatches:
+        print(f"  Tipos distintos de la detección anterior: {len(mismatches)} (p. ej. {mismatches[0]!r})")
+
+    per_input = results["classify_sources"] / args.n * 1e6
+    if args.max_us is not None and per_input > args.max_us:
+        print(f"REGRESIÓN: {per_input:.2f} µs/entrada > {args.max_us}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark de arranque en frío de run.py.
+Compara el dispatcher `run.py nlm ...` con ejecutar el script directamente
+y con un intérprete vacío, para detectar regresiones de arranque.
+
+Uso:
+  .venv/bin/python benchmarks/bench_startup.py [--runs 20] [--max-overhead-ms 30]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SKILL_DIR = Path(__file__).parent.parent
+RUN_PY = SKILL_DIR / "scripts" / "run.py"
+VENV_PYTHON = SKILL_DIR / ".venv" / "bin" / "python"
+
+# Comando sin red: solo mide arranque, imports y parseo de argumentos
+PROBE = ["sources", "detect", "https://example.com"]
+
+
+def _cases(python: str) -> dict[str, list[str]]:
+    return {
+        "python_vacio": [python, "-c", "pass"],
+        "script_directo": [python, str(SKILL_DIR / "scripts" / "nlm_sources.py")] + PROBE[1:],
+        "run_nlm": [python, str(RUN_PY), "nlm"] + PROBE,
+        "run_script": [python, str(RUN_PY), "nlm_sources.py"] + PROBE[1:],
+    }
+
+
+def _time_ms(cmd: list[str]) -> float:
+    start = time.perf_counter()
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+    return (time.perf_counter() - start) * 1000
+
+
+def bench(python: str, runs: int) -> dict[str, float]:
+    """Mediana en ms de cada caso (tras una ejecución de calentamiento)."""
+    results = {}
+    for name, cmd in _cases(python).items():
+        _time_ms(cmd)
+        results[name] = statistics.median(_time_ms(cmd) for _ in range(runs))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de arranque de run.py")
+    parser.add_argument("--runs", type=int, default=20, help="Ejecuciones por caso (default: 20)")
+    parser.add_argument("--python", help="Intérprete a medir (default: .venv del skill)")
+    parser.add_argument("--max-overhead-ms", type=float,
+                        help="Fallar si run.py nlm tarda más de N ms sobre el script directo")
+    args = parser.parse_args()
+
+    python = args.python or str(VENV_PYTHON)
+    if not Path(python).exists():
+        print(f"ERROR: No existe {python}. Ejecuta antes: python scripts/run.py nlm auth check")
+        return 1
+
+    results = bench(python, args.runs)
+    print(f"ARRANQUE ({args.runs} ejecuciones, mediana):")
+    for name, ms in results.items():
+        print(f"  {name:<16} {ms:8.1f} ms")
+
+    overhead = results["run_nlm"] - results["script_directo"]
+    print(f"\n  Sobrecoste run.py nlm: {overhead:+.1f} ms")
+    if args.max_overhead_ms is not None and overhead > args.max_overhead_ms:
+        print(f"REGRESIÓN: sobrecoste > {args.max_overhead_ms} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Suite de benchmarks de los comandos nlm_* contra el backend falso (nlm_fake.py).
+Mide tiempo de pared, CPU (user+sys) y RSS máximo de cada caso en su propio
+proceso, guarda los resultados en JSON y los compara con un baseline.
+
+Uso:
+  python benchmarks/run_benchmarks.py                      # medir y comparar con baseline.json
+  python benchmarks/run_benchmarks.py --save-baseline      # fijar el baseline de esta máquina
+  python benchmarks/run_benchmarks.py -k sources --runs 5  # solo casos que contengan 'sources'
+  python benchmarks/run_benchmarks.py --latency "chat=fixed:0.5;default=fixed:0.02"
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).parent
+SCRIPTS_DIR = BENCH_DIR.parent / "scripts"
+RESULTS_DIR = BENCH_DIR / "results"
+BASELINE_FILE = BENCH_DIR / "baseline.json"
+
+# Tamaño de la biblioteca sintética para list/sync/activate y _resolve_id
+LIBRARY_SIZE = 200
+LARGE_LIBRARY_SIZE = 5000
+RESOLVE_CALLS = 200
+
+RESOLVE_SNIPPET = """
+import sys
+sys.path.insert(0, {scripts!r})
+from nlm_notebook import _resolve_id
+for prefix in {prefixes!r}:
+    _resolve_id(prefix)
+"""
+
+
+class Context:
+    """Directorio temporal con data/ y estado del backend falso para un caso."""
+
+    def __init__(self, root: Path, latency: str):
+        self.root = root
+        self.data_dir = root / "data"
+        self.env = dict(
+            os.environ,
+            NLM_FAKE_BACKEND="1",
+            NLM_FAKE_STATE=str(root / "fake_state.json"),
+            NLM_FAKE_LATENCY=latency,
+            NLM_DATA_DIR=str(self.data_dir),
+            NLM_NO_DAEMON="1",
+            # Medimos el coste propio de los comandos, no las esperas de cuota
+            NLM_LIMITS="off",
+        )
+
+    def script(self, name: str, *args) -> list[str]:
+        return [sys.executable, str(SCRIPTS_DIR / name), *args]
+
+    def run(self, cmd: list[str]):
+        subprocess.run(cmd, env=self.env, check=True, stdout=subprocess.DEVNULL)
+
+    def seed_library(self) -> list[str]:
+        """Sincroniza library.json con los notebooks de NLM_FAKE_NOTEBOOKS."""
+        self.run(self.script("nlm_notebook.py", "list"))
+        return self.notebook_ids()
+
+    def notebook_ids(self) -> list[str]:
+        library = json.loads((self.data_dir / "library.json").read_text())
+        return list(library["notebooks"])
+
+    def write_library(self, size: int) -> list[str]:
+        """library.json sintético (sin pasar por el backend)."""
+        ids = [str(uuid.uuid4()) for _ in range(size)]
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        library = {
+            "notebooks": {nid: {"id": nid, "name": f"Notebook {i}", "tags": []} for i, nid in enumerate(ids)},
+            "active_notebook_id": None,
+            "last_sync": None,
+        }
+        (self.data_dir / "library.json").write_text(json.dumps(library))
+        return ids
+
+
+# === Casos: setup(ctx) → comando a medir ===
+
+def _with_notebook(ctx: Context) -> str:
+    ctx.env["NLM_FAKE_NOTEBOOKS"] = "1"
+    return ctx.seed_library()[0]
+
+
+def case_cold_start(ctx):
+    return ctx.script("nlm_sources.py", "detect", "https://example.com")
+
+
+def case_notebook_list(ctx):
+    ctx.env["NLM_FAKE_NOTEBOOKS"] = str(LIBRARY_SIZE)
+    return ctx.script("nlm_notebook.py", "list")
+
+
+def case_notebook_sync(ctx):
+    ctx.env["NLM_FAKE_NOTEBOOKS"] = str(LIBRARY_SIZE)
+    ctx.seed_library()
+    return ctx.script("nlm_notebook.py", "sync")
+
+
+def case_notebook_activate(ctx):
+    ctx.env["NLM_FAKE_NOTEBOOKS"] = str(LIBRARY_SIZE)
+    ids = ctx.seed_library()
+    return ctx.script("nlm_notebook.py", "activate", "--id", ids[-1][:8])
+
+
+def case_resolve_id_large(ctx):
+    ids = ctx.write_library(LARGE_LIBRARY_SIZE)
+    prefixes = [nid[:8] for nid in ids[:RESOLVE_CALLS]]
+    code = RESOLVE_SNIPPET.format(scripts=str(SCRIPTS_DIR), prefixes=prefixes)
+    return [sys.executable, "-c", code]
+
+
+def _case_sources_add(count: int):
+    def case(ctx):
+        nid = _with_notebook(ctx)
+        args = []
+        for i in range(count):
+            args += ["-s", f"https://example.com/articulo/{i}"]
+        return ctx.script("nlm_sources.py", "add", "--id", nid, *args)
+    return case
+
+
+def case_query_ask(ctx):
+    nid = _with_notebook(ctx)
+    return ctx.script("nlm_query.py", "ask", "--id", nid, "-q", "¿De qué trata este notebook?")
+
+
+def case_studio_generate(ctx):
+    nid = _with_notebook(ctx)
+    output = ctx.root / "quiz.json"
+    return ctx.script("nlm_studio.py", "generate", "--id", nid, "-t", "quiz", "-o", str(output))
+
+
+def case_workflow_pipeline(ctx):
+    args = ["--name", "Benchmark"]
+    for i in range(5):
+        args += ["-s", f"https://example.com/tema/{i}"]
+    args += ["-q", "Resume los temas", "-q", "¿Qué conceptos se repiten?", "-t", "quiz", "-t", "report"]
+    return ctx.script("nlm_workflow.py", *args)
+
+
+CASES = {
+    "cold_start": case_cold_start,
+    "notebook_list": case_notebook_list,
+    "notebook_sync": case_notebook_sync,
+    "notebook_activate": case_notebook_activate,
+    "resolve_id_large": case_resolve_id_large,
+    "sources_add_1": _case_sources_add(1),
+    "sources_add_10": _case_sources_add(10),
+    "sources_add_100": _case_sources_add(100),
+    "query_ask": case_query_ask,
+    "studio_generate": case_studio_generate,
+    "workflow_pipeline": case_workflow_pipeline,
+}
+
+
+# === Medición ===
+
+def _measure(cmd: list[str], env: dict) -> dict:
+    """Ejecuta cmd y devuelve wall/cpu/RSS del proceso hijo (os.wait4)."""
+    with tempfile.TemporaryFile() as stderr:
+        start = time.perf_counter()
+        proc = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=stderr)
+        _, status, usage = os.wait4(proc.pid, 0)
+        wall = time.perf_counter() - start
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        if proc.returncode != 0:
+            stderr.seek(0)
+            raise RuntimeError(f"{cmd[1]} terminó con {proc.returncode}: {stderr.read().decode()[-500:]}")
+    rss_kb = usage.ru_maxrss / 1024 if sys.platform == "darwin" else usage.ru_maxrss
+    return {"wall_ms": wall * 1000, "cpu_ms": (usage.ru_utime + usage.ru_stime) * 1000, "rss_kb": rss_kb}
+
+
+def run_case(name: str, runs: int, latency: str) -> dict:
+    """Mediana de wall/CPU y máximo de RSS sobre `runs` ejecuciones, cada una en limpio."""
+    samples = []
+    for _ in range(runs):
+        root = Path(tempfile.mkdtemp(prefix=f"nlm-bench-{name}-"))
+        try:
+            ctx = Context(root, latency)
+            cmd = CASES[name](ctx)
+            samples.append(_measure(cmd, ctx.env))
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+    return {
+        "wall_ms": statistics.median(s["wall_ms"] for s in samples),
+        "cpu_ms": statistics.median(s["cpu_ms"] for s in samples),
+        "rss_kb": max(s["rss_kb"] for s in samples),
+        "runs": runs,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Casos cuyo wall, CPU o RSS empeoran más de `tolerance` (fracción) respecto al baseline."""
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get("cases", {}).get(name)
+        if not base:
+            continue
+        for metric in ("wall_ms", "cpu_ms", "rss_kb"):
+            if base[metric] and current[metric] > base[metric] * (1 + tolerance):
+                change = current[metric] / base[metric] - 1
+                regressions.append(f"{name}.{metric}: {base[metric]:.1f} → {current[metric]:.1f} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de comandos nlm_* (backend falso)")
+    parser.add_argument("-k", "--filter", help="Solo casos cuyo nombre contenga este texto")
+    parser.add_argument("--runs", type=int, default=3, help="Ejecuciones por caso (default: 3)")
+    parser.add_argument("--latency", default="", help="NLM_FAKE_LATENCY para el backend falso (default: sin latencia)")
+    parser.add_argument("--output", "-o", help="JSON de resultados (default: benchmarks/results/latest.json)")
+    parser.add_argument("--baseline", default=str(BASELINE_FILE), help="Baseline con el que comparar")
+    parser.add_argument("--save-baseline", action="store_true", help="Guardar estos resultados como baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Empeoramiento permitido frente al baseline (default: 0.25 = 25%%)")
+    args = parser.parse_args()
+
+    names = [n for n in CASES if not args.filter or args.filter in n]
+    if not names:
+        print(f"ERROR: Ningún caso coincide con '{args.filter}'")
+        return 1
+
+    results = {}
+    print(f"{'caso':<20} {'wall ms':>10} {'cpu ms':>10} {'rss MB':>8}")
+    for name in names:
+        r = run_case(name, args.runs, args.latency)
+        results[name] = r
+        print(f"{name:<20} {r['wall_ms']:>10.1f} {r['cpu_ms']:>10.1f} {r['rss_kb'] / 1024:>8.1f}")
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "latency": args.latency,
+        "cases": results,
+    }
+
+    output = Path(args.output) if args.output else RESULTS_DIR / "latest.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"\nRESULTADOS: {output}")
+
+    if args.save_baseline:
+        Path(args.baseline).write_text(json.dumps(report, indent=2))
+        print(f"BASELINE guardado: {args.baseline}")
+        return 0
+
+    baseline_path = Path(args.baseline)
+    if not baseline_path.exists():
+        print("Sin baseline (usa --save-baseline para crearlo)")
+        return 0
+
+    regressions = compare(results, json.loads(baseline_path.read_text()), args.tolerance)
+    if regressions:
+        print(f"\nREGRESIONES ({len(regressions)}):")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print(f"\nSin regresiones frente a {baseline_path} (tolerancia {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,6 +9,8 @@ import sys
 import subprocess
 from pathlib import Path
 
+from .env_stamp import stamp_is_current, write_stamp
+
 
 def ensure_venv_and_run():
     """
@@ -67,6 +69,7 @@ def ensure_venv_and_run():
                 check=True,
                 capture_output=True
             )
+            write_stamp(browser_installed=True)
 
         print("✅ Environment ready! All dependencies isolated in .venv/")
 
@@ -77,5 +80,6 @@ def ensure_venv_and_run():
         print("   Or activate: source .venv/bin/activate")
 
 
-# Check environment when module is imported
-ensure_venv_and_run()
\ No newline at end of file
+# Check environment when module is imported (skipped while the venv stamp is current)
+if not stamp_is_current():
+    ensure_venv_and_run()
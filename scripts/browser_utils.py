@@ -3,13 +3,13 @@ Browser Utilities for NotebookLM Skill
 Handles browser launching, stealth features, and common interactions
 """
 
-import json
 import time
 import random
 from typing import Optional, List
 
 from patchright.sync_api import Playwright, BrowserContext, Page
 from config import BROWSER_PROFILE_DIR, STATE_FILE, BROWSER_ARGS, USER_AGENT
+from nlm_client import load_auth_material
 
 
 class BrowserFactory:
@@ -45,15 +45,13 @@ class BrowserFactory:
     @staticmethod
     def _inject_cookies(context: BrowserContext):
         """Inject cookies from state.json if available"""
-        if STATE_FILE.exists():
-            try:
-                with open(STATE_FILE, 'r') as f:
-                    state = json.load(f)
-                    if 'cookies' in state and len(state['cookies']) > 0:
-                        context.add_cookies(state['cookies'])
-                        # print(f"  🔧 Injected {len(state['cookies'])} cookies from state.json")
-            except Exception as e:
-                print(f"  ⚠️  Could not load state.json: {e}")
+        try:
+            material = load_auth_material(STATE_FILE)
+            if material and material.cookies:
+                context.add_cookies(material.cookies)
+                # print(f"  🔧 Injected {len(material.cookies)} cookies from state.json")
+        except Exception as e:
+            print(f"  ⚠️  Could not load state.json: {e}")
 
 
 class StealthUtils:
@@ -0,0 +1,111 @@
+"""
+Environment stamp for the NotebookLM skill venv
+Records what the last successful setup installed (requirements.txt hash,
+interpreter version, browser install) so normal runs can skip the checks.
+
+The fast path is one stat of requirements.txt plus reading the stamp, and
+only uses modules the interpreter has already loaded (os, sys).
+"""
+
+import os
+import sys
+
+SKILL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VENV_DIR = os.path.join(SKILL_DIR, ".venv")
+REQUIREMENTS_FILE = os.path.join(SKILL_DIR, "requirements.txt")
+STAMP_FILE = os.path.join(VENV_DIR, ".skill-stamp")
+
+# Stamp format (one line):
+#   <requirements mtime_ns>:<size>|<python version>|<requirements sha256>|browser=<0|1>
+
+
+def _in_skill_venv():
+    return os.path.realpath(sys.prefix) == os.path.realpath(VENV_DIR)
+
+
+def venv_python_version():
+    """Python version of the skill venv (from pyvenv.cfg), or None"""
+    try:
+        with open(os.path.join(VENV_DIR, "pyvenv.cfg")) as f:
+            for line in f:
+                key, _, value = line.partition("=")
+                if key.strip() in ("version", "version_info"):
+                    return value.strip()
+    except OSError:
+        pass
+    return None
+
+
+def _python_version():
+    if _in_skill_venv():
+        return "%d.%d.%d" % sys.version_info[:3]
+    return venv_python_version()
+
+
+def requirements_hash():
+    """sha256 of requirements.txt"""
+    import hashlib
+    with open(REQUIREMENTS_FILE, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _requirements_key():
+    st = os.stat(REQUIREMENTS_FILE)
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+def read_stamp():
+    """Parsed stamp as a dict, or None if missing/corrupt"""
+    try:
+        with open(STAMP_FILE) as f:
+            fields = f.read().strip().split("|")
+    except OSError:
+        return None
+    if len(fields) != 4:
+        return None
+    return {
+        "requirements_key": fields[0],
+        "python": fields[1],
+        "requirements_hash": fields[2],
+        "browser": fields[3] == "browser=1",
+    }
+
+
+def write_stamp(browser_installed):
+    """Record the current requirements.txt and interpreter as installed"""
+    line = "|".join([
+        _requirements_key(),
+        _python_version() or "?",
+        requirements_hash(),
+        f"browser={1 if browser_installed else 0}",
+    ])
+    tmp = STAMP_FILE + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(line + "\n")
+    os.replace(tmp, STAMP_FILE)
+
+
+def stamp_is_current():
+    """
+    True if the venv was set up for the current requirements.txt and
+    interpreter. A touched-but-identical requirements.txt is detected by
+    hash and only refreshes the stamp.
+    """
+    try:
+        key = _requirements_key()
+        with open(STAMP_FILE) as f:
+            line = f.read()
+    except OSError:
+        return False
+
+    python = _python_version()
+    if line.startswith(f"{key}|{python}|"):
+        return True
+
+    stamp = read_stamp()
+    if stamp is None or stamp["python"] != python:
+        return False
+    if stamp["requirements_hash"] != requirements_hash():
+        return False
+    write_stamp(stamp["browser"])
+    return True
@@ -6,16 +6,24 @@ Comandos: check, setup, migrate, validate
 
 import argparse
 import json
+import os
 import shutil
 import subprocess
 import sys
 from pathlib import Path
 
-from nlm_client import NLM_HOME, LEGACY_STATE, _get_storage_path, _create_client, run_async
+from nlm_client import (
+    NLM_HOME, LEGACY_STATE, _get_storage_path, _create_client, run_async,
+    invalidate_auth_cache, load_auth_material,
+)
 
 
 def cmd_check():
     """Comprueba si hay auth válida disponible."""
+    if os.environ.get("NLM_FAKE_BACKEND"):
+        print("AUTH FALSA: NLM_FAKE_BACKEND activo, sin llamadas a Google")
+        return 0
+
     path = _get_storage_path()
     if path is None:
         print("NO AUTH: No se encontró storage_state.json")
@@ -29,8 +37,7 @@ def cmd_check():
 
     # Verificar que el JSON es válido
     try:
-        data = json.loads(path.read_text())
-        cookies = data.get("cookies", [])
+        cookies = load_auth_material(path).cookies
         cookie_names = {c.get("name", "") for c in cookies}
         required = {"SID", "HSID", "SSID"}
         missing = required - cookie_names
@@ -83,6 +90,7 @@ def cmd_migrate():
     # Crear directorio y copiar
     NLM_HOME.mkdir(parents=True, exist_ok=True)
     shutil.copy2(LEGACY_STATE, native)
+    invalidate_auth_cache()
     print(f"Auth migrada: {LEGACY_STATE} → {native}")
 
     # Validar la copia
@@ -107,6 +115,7 @@ def cmd_setup():
         )
         if result.returncode == 0:
             print("Login completado.")
+            invalidate_auth_cache()
             return cmd_validate()
         else:
             print(f"Login falló (código {result.returncode})")
@@ -137,6 +146,7 @@ def main():
             native = NLM_HOME / "storage_state.json"
             if native.exists():
                 native.unlink()
+                invalidate_auth_cache()
         sys.exit(cmd_migrate())
     elif args.command == "validate":
         sys.exit(cmd_validate())
@@ -0,0 +1,203 @@
+"""
+Caché persistente de respuestas de chat.ask (tabla `answers` de nlm_store).
+
+La clave combina notebook, source_ids ordenados, la pregunta normalizada y
+la configuración de chat activa del notebook. Las entradas caducan a los
+NLM_CACHE_TTL segundos y, por encima de NLM_CACHE_MAX_ENTRIES, se descartan
+las menos usadas recientemente.
+
+Cada respuesta guarda además la huella de las fuentes del notebook (ids,
+títulos y estado según sources.list) en el momento de preguntar: si las
+fuentes cambian, la respuesta deja de servirse. La huella se recalcula como
+mucho cada NLM_FINGERPRINT_TTL segundos, o antes si nlm_sources la invalida.
+
+Si no hay respuesta para la pregunta exacta, lookup_similar() busca una a
+una pregunta casi igual del mismo notebook, fuentes y configuración.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+import nlm_similar
+import nlm_store
+
+CACHE_TTL = float(os.environ.get("NLM_CACHE_TTL", 7 * 24 * 3600))
+CACHE_MAX_ENTRIES = int(os.environ.get("NLM_CACHE_MAX_ENTRIES", 5000))
+FINGERPRINT_TTL = float(os.environ.get("NLM_FINGERPRINT_TTL", 60))
+
+_PUNCTUATION = "¿?¡!.,;: "
+
+
+def normalize_question(question: str) -> str:
+    """Minúsculas, espacios colapsados y sin puntuación en los extremos."""
+    return " ".join(question.casefold().split()).strip(_PUNCTUATION)
+
+
+def cache_key(notebook_id: str, question: str, source_ids: list[str] = None) -> str:
+    """Clave de caché para una pregunta (incluye la configuración de chat actual)."""
+    material = json.dumps([
+        notebook_id,
+        sorted(source_ids or []),
+        normalize_question(question),
+        nlm_store.get_chat_config(notebook_id),
+    ], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+def cache_scope(notebook_id: str, source_ids: list[str] = None) -> str:
+    """Ámbito de las preguntas comparables entre sí: notebook, fuentes y configuración de chat."""
+    material = json.dumps([
+        notebook_id,
+        sorted(source_ids or []),
+        nlm_store.get_chat_config(notebook_id),
+    ], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(material.encode()).hexdigest()[:32]
+
+
+def _fetch(key: str, fingerprint: str) -> dict | None:
+    """Entrada válida (sin caducar y con la huella actual); las no válidas se borran."""
+    conn = nlm_store.connect()
+    now = time.time()
+    row = conn.execute(
+        "SELECT payload, created_at, fingerprint, question FROM answers WHERE key = ?", (key,)
+    ).fetchone()
+    if row is None:
+        return None
+
+    fresh = now - row[1] <= CACHE_TTL
+    if fresh and row[2] == fingerprint:
+        with conn:
+            conn.execute(
+                "UPDATE answers SET accessed_at = ?, hits = hits + 1 WHERE key = ?", (now, key)
+            )
+        payload = json.loads(row[0])
+        payload["cached_at"] = row[1]
+        payload["cached_question"] = row[3]
+        return payload
+
+    with conn:
+        conn.execute("DELETE FROM answers WHERE key = ?", (key,))
+    nlm_store.bump("cache.stale" if fresh else "cache.expired")
+    return None
+
+
+def lookup(key: str, fingerprint: str) -> dict | None:
+    """Respuesta cacheada (dict de _response_to_dict) o None si no hay, caducó o cambiaron las fuentes."""
+    payload = _fetch(key, fingerprint)
+    nlm_store.bump("cache.hits" if payload else "cache.misses")
+    return payload
+
+
+def lookup_similar(notebook_id: str, question: str, source_ids: list[str], fingerprint: str,
+                   threshold: float = nlm_similar.SIMILARITY_THRESHOLD) -> dict | None:
+    """
+    Respuesta cacheada a una pregunta casi igual (ver nlm_similar), con la
+    similitud en payload["similarity"]. Se consulta tras un fallo de lookup()
+    si se activó un umbral; descarta las que difieren en números o negaciones.
+    """
+    for score, key in nlm_similar.find(cache_scope(notebook_id, source_ids), question, threshold):
+        payload = _fetch(key, fingerprint)
+        if payload and nlm_similar.compatible(question, payload["cached_question"]):
+            nlm_store.bump("cache.similar_hits")
+            payload["similarity"] = round(score, 3)
+            return payload
+    return None
+
+
+def store(key: str, notebook_id: str, question: str, payload: dict, fingerprint: str,
+          source_ids: list[str] = None):
+    """Guarda una respuesta (con la huella de fuentes actual) y aplica TTL y límite de tamaño."""
+    conn = nlm_store.connect()
+    now = time.time()
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO answers "
+            "(key, notebook_id, question, payload, created_at, accessed_at, fingerprint) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, notebook_id, question, json.dumps(payload, ensure_ascii=False), now, now, fingerprint),
+        )
+        expired = conn.execute(
+            "DELETE FROM answers WHERE created_at < ?", (now - CACHE_TTL,)
+        ).rowcount
+        # LRU: conservar solo las CACHE_MAX_ENTRIES accedidas más recientemente
+        evicted = conn.execute(
+            "DELETE FROM answers WHERE key IN ("
+            "  SELECT key FROM answers ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (CACHE_MAX_ENTRIES,),
+        ).rowcount
+    nlm_similar.index(key, cache_scope(notebook_id, source_ids), question)
+    nlm_store.bump("cache.stores")
+    if expired:
+        nlm_store.bump("cache.expired", expired)
+    if evicted:
+        nlm_store.bump("cache.evicted", evicted)
+
+
+def stats() -> dict:
+    """Contadores de la caché más tamaño actual."""
+    conn = nlm_store.connect()
+    result = {"hits": 0, "similar_hits": 0, "misses": 0, "stores": 0, "expired": 0, "stale": 0,
+              "evicted": 0, "fingerprint_checks": 0}
+    result.update(nlm_store.counters("cache."))
+    result["entries"], result["notebooks"] = conn.execute(
+        "SELECT COUNT(*), COUNT(DISTINCT notebook_id) FROM answers"
+    ).fetchone()
+    result["ttl"] = CACHE_TTL
+    result["max_entries"] = CACHE_MAX_ENTRIES
+    return result
+
+
+def clear(notebook_id: str = None) -> int:
+    """Borra la caché (entera o de un notebook). Devuelve las entradas borradas."""
+    conn = nlm_store.connect()
+    with conn:
+        if notebook_id:
+            conn.execute("DELETE FROM source_fingerprints WHERE notebook_id = ?", (notebook_id,))
+            return conn.execute("DELETE FROM answers WHERE notebook_id = ?", (notebook_id,)).rowcount
+        deleted = conn.execute("DELETE FROM answers").rowcount
+        conn.execute("DELETE FROM source_fingerprints")
+        conn.execute("DELETE FROM counters WHERE name LIKE 'cache.%'")
+    return deleted
+
+
+# === Huella de fuentes ===
+
+def fingerprint_sources(sources) -> str:
+    """Huella de un conjunto de fuentes: ids, títulos y estado (sin importar el orden)."""
+    items = sorted(
+        (src.id, getattr(src, "title", None) or "", str(getattr(src, "status", "")))
+        for src in sources
+    )
+    return hashlib.sha256(json.dumps(items, ensure_ascii=False).encode()).hexdigest()
+
+
+def stored_fingerprint(notebook_id: str) -> str | None:
+    """Huella guardada si se comprobó hace menos de FINGERPRINT_TTL segundos."""
+    row = nlm_store.connect().execute(
+        "SELECT fingerprint, checked_at FROM source_fingerprints WHERE notebook_id = ?", (notebook_id,)
+    ).fetchone()
+    if row and time.time() - row[1] <= FINGERPRINT_TTL:
+        return row[0]
+    return None
+
+
+async def refresh_fingerprint(client, notebook_id: str) -> str:
+    """Recalcula la huella con una llamada a sources.list y la guarda."""
+    fingerprint = fingerprint_sources(await client.sources.list(notebook_id))
+    conn = nlm_store.connect()
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO source_fingerprints (notebook_id, fingerprint, checked_at) VALUES (?, ?, ?)",
+            (notebook_id, fingerprint, time.time()),
+        )
+    nlm_store.bump("cache.fingerprint_checks")
+    return fingerprint
+
+
+def invalidate_fingerprint(notebook_id: str):
+    """Fuerza a recalcular la huella en la próxima consulta (tras añadir o borrar fuentes)."""
+    conn = nlm_store.connect()
+    with conn:
+        conn.execute("DELETE FROM source_fingerprints WHERE notebook_id = ?", (notebook_id,))
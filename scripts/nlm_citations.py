@@ -0,0 +1,128 @@
+"""
+Índice local de citas (tabla `citations` de nlm_store).
+
+Cada respuesta de chat.ask registra sus referencias: fuente, número de
+cita, texto citado, pregunta y respuesta a la que pertenecen. La búsqueda
+de texto usa SQLite FTS5 si está disponible y LIKE si no.
+"""
+
+import sqlite3
+import time
+
+import nlm_store
+
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS citations_fts USING fts5(
+    cited_text, question, content='citations', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS citations_ai AFTER INSERT ON citations BEGIN
+    INSERT INTO citations_fts (rowid, cited_text, question)
+    VALUES (new.id, new.cited_text, new.question);
+END;
+CREATE TRIGGER IF NOT EXISTS citations_ad AFTER DELETE ON citations BEGIN
+    INSERT INTO citations_fts (citations_fts, rowid, cited_text, question)
+    VALUES ('delete', old.id, old.cited_text, old.question);
+END;
+"""
+
+_fts = None
+
+
+def _connect() -> sqlite3.Connection:
+    """Conexión de nlm_store con el índice FTS5 creado (si el SQLite lo soporta)."""
+    global _fts
+    conn = nlm_store.connect()
+    if _fts is None:
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'citations_fts'"
+        ).fetchone()
+        try:
+            conn.executescript(_FTS_SCHEMA)
+        except sqlite3.OperationalError:
+            _fts = False  # sin FTS5: búsqueda con LIKE
+        else:
+            _fts = True
+            if not exists:
+                conn.execute("INSERT INTO citations_fts (citations_fts) VALUES ('rebuild')")
+                conn.commit()
+    return conn
+
+
+def answer_id(data: dict) -> str:
+    """Identificador de una respuesta: conversation_id:turno."""
+    return f"{data['conversation_id']}:{data['turn']}"
+
+
+def index_answer(notebook_id: str, question: str, data: dict) -> int:
+    """Registra las citas de una respuesta (dict de _response_to_dict). Devuelve cuántas eran nuevas."""
+    if not data.get("references"):
+        return 0
+    conn = _connect()
+    now = time.time()
+    added = 0
+    with conn:
+        for ref in data["references"]:
+            added += conn.execute(
+                "INSERT OR IGNORE INTO citations "
+                "(notebook_id, answer_id, source_id, citation_number, cited_text, question, answer, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (notebook_id, answer_id(data), ref["source_id"], ref["citation_number"],
+                 ref["cited_text"] or "", question, data["answer"], now),
+            ).rowcount
+    return added
+
+
+def _fts_query(text: str) -> str:
+    # Cada palabra como término literal: sin sintaxis FTS5 accidental (comillas, NEAR, *...)
+    return " ".join('"' + word.replace('"', '""') + '"' for word in text.split())
+
+
+def search(text: str, notebook_id: str = None, limit: int = 20) -> list[dict]:
+    """Citas cuyo texto citado (o pregunta) contiene `text`, las más relevantes primero."""
+    conn = _connect()
+    columns = "c.notebook_id, c.answer_id, c.source_id, c.citation_number, c.cited_text, c.question, c.created_at"
+    params = []
+    if _fts:
+        query = (f"SELECT {columns} FROM citations_fts f JOIN citations c ON c.id = f.rowid "
+                 f"WHERE citations_fts MATCH ?")
+        params.append(_fts_query(text))
+    else:
+        escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        query = (f"SELECT {columns} FROM citations c "
+                 f"WHERE (c.cited_text LIKE ? ESCAPE '\\' OR c.question LIKE ? ESCAPE '\\')")
+        params += [f"%{escaped}%"] * 2
+    if notebook_id:
+        query += " AND c.notebook_id = ?"
+        params.append(notebook_id)
+    query += " ORDER BY f.rank" if _fts else " ORDER BY c.created_at DESC"
+    rows = conn.execute(query + " LIMIT ?", (*params, limit)).fetchall()
+    keys = ("notebook_id", "answer_id", "source_id", "citation_number", "cited_text", "question", "created_at")
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def answers_citing(source_id: str, notebook_id: str = None, limit: int = 50) -> list[dict]:
+    """Respuestas que citaron una fuente (ID o prefijo), las más recientes primero."""
+    query = ("SELECT notebook_id, answer_id, question, answer, COUNT(*), MAX(created_at) FROM citations "
+             "WHERE source_id LIKE ? || '%'")
+    params = [source_id]
+    if notebook_id:
+        query += " AND notebook_id = ?"
+        params.append(notebook_id)
+    query += " GROUP BY notebook_id, answer_id ORDER BY MAX(created_at) DESC LIMIT ?"
+    rows = _connect().execute(query, (*params, limit)).fetchall()
+    keys = ("notebook_id", "answer_id", "question", "answer", "citations", "created_at")
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def stats() -> dict:
+    conn = _connect()
+    citations, answers, sources = conn.execute(
+        "SELECT COUNT(*), COUNT(DISTINCT answer_id), COUNT(DISTINCT source_id) FROM citations"
+    ).fetchone()
+    return {"citations": citations, "answers": answers, "sources": sources, "fts": bool(_fts)}
+
+
+def forget(notebook_id: str):
+    conn = _connect()
+    with conn:
+        conn.execute("DELETE FROM citations WHERE notebook_id = ?", (notebook_id,))
@@ -1,11 +1,21 @@
 #!/usr/bin/env python3
 """
 Wrapper síncrono sobre la API async de notebooklm-py.
-Cada script nlm_* importa get_client() para obtener un cliente configurado.
+Cada script nlm_* importa _create_client() para obtener un cliente configurado.
+Si el daemon (nlm_daemon.py) está activo, las llamadas se delegan en él.
 """
 
 import asyncio
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import random
+import re
 import sys
+import time
+from contextlib import asynccontextmanager, nullcontext
 from pathlib import Path
 
 # Rutas de autenticación (en orden de prioridad)
@@ -13,32 +23,946 @@ NLM_HOME = Path.home() / ".notebooklm"
 SKILL_DIR = Path(__file__).parent.parent
 LEGACY_STATE = SKILL_DIR / "data" / "browser_state" / "state.json"
 
+# Datos locales del skill (library.json, outputs...). NLM_DATA_DIR lo redirige (benchmarks, tests)
+DATA_DIR = Path(os.environ.get("NLM_DATA_DIR", SKILL_DIR / "data"))
+
+# Segundos que un cliente del pool puede estar sin usarse antes de cerrarse
+POOL_IDLE_TIMEOUT = float(os.environ.get("NLM_POOL_IDLE_TIMEOUT", 300))
+
+
+# Ruta de auth resuelta (solo se memoriza cuando existe)
+_storage_path: Path | None = None
+
+# Material de auth parseado por ruta, válido mientras no cambien mtime y tamaño
+_auth_cache: dict[str, "AuthMaterial"] = {}
+
 
 def _get_storage_path() -> Path | None:
     """Busca storage_state.json en las rutas conocidas."""
+    global _storage_path
+    if _storage_path is not None:
+        return _storage_path
     # 1. Ruta nativa de notebooklm-py
     native = NLM_HOME / "storage_state.json"
     if native.exists():
-        return native
+        _storage_path = native
     # 2. Ruta legacy del skill
-    if LEGACY_STATE.exists():
-        return LEGACY_STATE
-    return None
+    elif LEGACY_STATE.exists():
+        _storage_path = LEGACY_STATE
+    return _storage_path
+
+
+class AuthMaterial:
+    """storage_state.json ya parseado, más los tokens derivados de sus cookies."""
+
+    __slots__ = ("path", "key", "state", "tokens")
+
+    def __init__(self, path: Path, key: tuple, state: dict):
+        self.path = path
+        self.key = key
+        self.state = state
+        self.tokens = None
+
+    @property
+    def cookies(self) -> list[dict]:
+        return self.state.get("cookies", [])
+
+
+def load_auth_material(path: Path | None = None) -> AuthMaterial | None:
+    """
+    Devuelve el storage_state parseado, reutilizándolo mientras el archivo
+    no cambie (clave: ruta, mtime, tamaño). None si no hay auth.
+    Lanza json.JSONDecodeError si el archivo no es JSON válido.
+    """
+    global _storage_path
+    path = path or _get_storage_path()
+    if path is None:
+        return None
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        # Solo esta ruta: el material de otras cuentas sigue siendo válido
+        _auth_cache.pop(str(path), None)
+        if _storage_path is not None and str(path) == str(_storage_path):
+            _storage_path = None  # la ruta por defecto se vuelve a buscar
+        return None
+
+    key = (st.st_mtime_ns, st.st_size)
+    cached = _auth_cache.get(str(path))
+    if cached is not None and cached.key == key:
+        return cached
+
+    material = AuthMaterial(Path(path), key, json.loads(Path(path).read_text()))
+    _auth_cache[str(path)] = material
+    return material
+
+
+def invalidate_auth_cache():
+    """Olvida rutas y material de auth. Llamar tras escribir un storage_state nuevo."""
+    global _storage_path
+    _storage_path = None
+    _auth_cache.clear()
+
+
+def _forget_auth_tokens(path: Path | None = None):
+    """Descarta los tokens derivados (p. ej. tras un error de auth) sin reparsear el archivo."""
+    material = _auth_cache.get(str(path or _get_storage_path()))
+    if material is not None:
+        material.tokens = None
 
 
 async def _create_client(storage_path: Path | None = None):
-    """Crea un cliente async de NotebookLM."""
+    """Crea un cliente async de NotebookLM (vía daemon si está activo)."""
+    if storage_path is None:
+        from nlm_daemon import connect_remote
+        remote = await connect_remote()
+        if remote is not None:
+            return remote
+    return await _open_client(storage_path)
+
+
+def backend_module():
+    """Módulo del backend activo (notebooklm o nlm_fake), para sus enums de configuración."""
+    if os.environ.get("NLM_FAKE_BACKEND"):
+        import nlm_fake
+        return nlm_fake
+    import notebooklm
+    return notebooklm
+
+
+async def _open_client(storage_path: Path | None = None):
+    """Crea un cliente async de NotebookLM en este proceso."""
+    if os.environ.get("NLM_FAKE_BACKEND"):
+        # Backend falso sin red para tests y benchmarks (ver nlm_fake.py)
+        from nlm_fake import FakeNotebookLMClient
+        return _govern(FakeNotebookLMClient.from_env(), os.environ.get("NLM_FAKE_STATE", "fake"))
+
     from notebooklm import NotebookLMClient
 
-    path = storage_path or _get_storage_path()
-    if path is None:
+    material = load_auth_material(storage_path)
+    if material is None:
         print("ERROR: No se encontró storage_state.json", file=sys.stderr)
         print("  Ejecuta: python scripts/run.py nlm_auth.py setup", file=sys.stderr)
         sys.exit(1)
 
-    return await NotebookLMClient.from_storage(str(path))
+    account = str(material.path.resolve())
+    try:
+        from notebooklm.auth import AuthTokens, extract_cookies_from_storage, fetch_tokens
+    except ImportError:
+        # Versión de notebooklm-py sin API de tokens: que la librería lea el archivo
+        return _govern(await NotebookLMClient.from_storage(str(material.path)), account)
+
+    if material.tokens is None:
+        cookies = extract_cookies_from_storage(material.state)
+        csrf_token, session_id = await fetch_tokens(cookies)
+        # storage_path: la librería guarda ahí las cookies que rote durante la sesión
+        material.tokens = AuthTokens(cookies=cookies, csrf_token=csrf_token, session_id=session_id,
+                                     storage_path=material.path)
+    return _govern(NotebookLMClient(material.tokens), account)
+
+
+# Código HTTP en el mensaje: solo junto a "HTTP"/"status" o a su frase estándar, nunca
+# dígitos sueltos (un id como 1a2b5003 o "límite de 500 fuentes" no es un error del servidor)
+_STATUS_RE = re.compile(
+    r"\b(?:http(?:/[\d.]+)?|status(?:[ _]?code)?)\W{0,3}(\d{3})\b"
+    r"|\b(\d{3}) (?:unauthorized|forbidden|too many requests|internal server error"
+    r"|bad gateway|service unavailable|gateway timeout)\b",
+    re.IGNORECASE,
+)
+
+
+def _http_status(exc: BaseException) -> int | None:
+    """Código HTTP de la excepción: atributo (exc o exc.response) o, si no, el mensaje."""
+    for obj in (exc, getattr(exc, "response", None)):
+        for attr in ("status_code", "status"):
+            value = getattr(obj, attr, None)
+            if isinstance(value, int) and 100 <= value < 600:
+                return value
+    match = _STATUS_RE.search(str(exc))
+    return int(match.group(1) or match.group(2)) if match else None
+
+
+def _is_auth_error(exc: BaseException) -> bool:
+    """Heurística: la sesión de Google ha caducado o no es válida."""
+    name = type(exc).__name__.lower()
+    text = str(exc).lower()
+    return ("auth" in name or _http_status(exc) in (401, 403)
+            or any(m in text for m in ("unauthenticated", "login required")))
+
+
+class _PoolEntry:
+    __slots__ = ("client", "auth_key", "material", "in_use", "last_used", "stale")
+
+    def __init__(self, client, material: AuthMaterial | None):
+        self.client = client
+        self.material = material
+        self.auth_key = material.key if material else None
+        self.in_use = 0
+        self.last_used = time.monotonic()
+        self.stale = False
+
+
+class ClientPool:
+    """
+    Pool de clientes ya abiertos, uno por storage_state.
+    Los clientes inactivos más de idle_timeout se cierran, y los que fallan
+    por auth se descartan para reabrirse con cookies frescas.
+    """
+
+    def __init__(self, idle_timeout: float = POOL_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self._entries: dict[str, _PoolEntry] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._loop = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _bind_loop(self):
+        # Los clientes httpx pertenecen a un event loop: si cambia (otro run_async),
+        # los anteriores ya no son utilizables
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._entries.clear()
+            self._locks.clear()
+            self._loop = loop
+
+    @staticmethod
+    def _key(storage_path: Path | None) -> str:
+        path = storage_path or _get_storage_path()
+        return str(Path(path).resolve()) if path else ""
+
+    async def _acquire(self, key: str, storage_path: Path | None) -> _PoolEntry:
+        self._bind_loop()
+        await self.sweep()
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            # Si storage_state cambió (nuevo login), el cliente abierto ya no vale
+            material = load_auth_material(storage_path)
+            auth_key = material.key if material else None
+            entry = self._entries.get(key)
+            if entry is not None and entry.auth_key != auth_key:
+                await self.evict(key)
+                entry = None
+            if entry is None:
+                client = await _open_client(storage_path)
+                entry = _PoolEntry(await client.__aenter__(), material)
+                self._entries[key] = entry
+            entry.in_use += 1
+            return entry
+
+    async def _release(self, key: str, entry: _PoolEntry):
+        entry.in_use -= 1
+        entry.last_used = time.monotonic()
+        if entry.stale and entry.in_use == 0:
+            await self._close(entry)
+
+    @staticmethod
+    async def _close(entry: _PoolEntry):
+        # csrf/session id pueden haber caducado mientras tanto: el próximo cliente los vuelve a pedir
+        if entry.material is not None:
+            entry.material.tokens = None
+        try:
+            await entry.client.__aexit__(None, None, None)
+        except Exception:
+            pass
+
+    async def evict(self, key: str):
+        """Saca un cliente del pool; se cierra cuando lo suelte el último usuario."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        entry.stale = True
+        if entry.in_use == 0:
+            await self._close(entry)
+
+    async def sweep(self):
+        """Cierra los clientes que llevan más de idle_timeout sin usarse."""
+        now = time.monotonic()
+        for key, entry in list(self._entries.items()):
+            if entry.in_use == 0 and now - entry.last_used > self.idle_timeout:
+                await self.evict(key)
+
+    async def close_all(self):
+        if self._loop is not asyncio.get_running_loop():
+            return
+        for key in list(self._entries):
+            await self.evict(key)
+
+    @asynccontextmanager
+    async def borrow(self, storage_path: Path | None = None):
+        """Presta un cliente abierto; al salir vuelve al pool en vez de cerrarse."""
+        key = self._key(storage_path)
+        entry = await self._acquire(key, storage_path)
+        try:
+            yield entry.client
+        except Exception as e:
+            if _is_auth_error(e):
+                _forget_auth_tokens(storage_path)
+                await self.evict(key)
+            raise
+        finally:
+            await self._release(key, entry)
+
+
+_POOL = ClientPool()
+
+
+def get_pool() -> ClientPool:
+    """Pool de clientes compartido por todo el proceso."""
+    return _POOL
+
+
+# === Límites de cuota: token bucket + concurrencia por clase de operación ===
+
+# Clases de operación con presupuesto propio
+OPERATION_CLASSES = ("chat", "upload", "studio", "list", "default")
+
+# rate: llamadas/s sostenidas, burst: ráfaga máxima, concurrency: llamadas simultáneas.
+# Se comparten entre procesos (lock files en DATA_DIR/limits). NLM_LIMITS admite un JSON
+# con overrides parciales, p. ej. '{"chat": {"concurrency": 5}}', o "off" para desactivar.
+DEFAULT_LIMITS = {
+    "chat": {"rate": 0.5, "burst": 3, "concurrency": 3},
+    "upload": {"rate": 1.0, "burst": 5, "concurrency": 4},
+    "studio": {"rate": 0.1, "burst": 2, "concurrency": 2},
+    "list": {"rate": 2.0, "burst": 10, "concurrency": 8},
+    "default": {"rate": 1.0, "burst": 5, "concurrency": 4},
+}
+LIMITS_DIR = DATA_DIR / "limits"
+
+# Llamadas de larga duración que solo esperan (no consumen cuota de escritura)
+_UNLIMITED_METHODS = {"artifacts.wait_for_completion"}
+
+try:
+    import fcntl
+except ImportError:  # Windows: límites solo dentro del proceso
+    fcntl = None
+
+
+def operation_class(method: str) -> str:
+    """Clasifica 'namespace.metodo' en chat, upload, studio, list o default."""
+    namespace, _, name = method.partition(".")
+    if namespace == "chat" and name in ("ask", "ask_stream"):
+        return "chat"
+    if namespace == "sources" and name.startswith("add_"):
+        return "upload"
+    if namespace == "artifacts" and name.startswith("generate_"):
+        return "studio"
+    if name.startswith(("list", "get")):
+        return "list"
+    return "default"
+
+
+def _load_limits() -> dict | None:
+    raw = os.environ.get("NLM_LIMITS", "").strip()
+    if raw.lower() == "off":
+        return None
+    limits = {name: dict(budget) for name, budget in DEFAULT_LIMITS.items()}
+    if raw:
+        try:
+            overrides = json.loads(raw)
+            if not isinstance(overrides, dict) or not all(isinstance(b, dict) for b in overrides.values()):
+                raise ValueError("se esperaba un objeto {clase: {rate, burst, concurrency}}")
+        except ValueError as e:
+            print(f"ERROR: NLM_LIMITS no es válido: {e}", file=sys.stderr)
+            print('  Ejemplo: NLM_LIMITS={"chat": {"rate": 0.5, "concurrency": 2}} o NLM_LIMITS=off', file=sys.stderr)
+            sys.exit(1)
+        for name, budget in overrides.items():
+            limits.setdefault(name, dict(DEFAULT_LIMITS["default"])).update(budget)
+    return limits
+
+
+class _TokenBucket:
+    """Token bucket con reserva: quien llega sin tokens queda en cola el tiempo justo."""
+
+    def __init__(self, rate: float, burst: float, state_file: Path | None):
+        self.rate = rate
+        self.burst = burst
+        self.state_file = state_file
+        self.tokens = burst
+        self.updated = time.time()
+
+    def _reserve(self, tokens: float, updated: float) -> tuple[float, float, float]:
+        now = time.time()
+        tokens = min(self.burst, tokens + (now - updated) * self.rate) - 1
+        wait = -tokens / self.rate if tokens < 0 else 0.0
+        return tokens, now, wait
+
+    def reserve(self) -> float:
+        """Reserva un token y devuelve cuántos segundos hay que esperar para usarlo."""
+        if self.state_file is None:
+            self.tokens, self.updated, wait = self._reserve(self.tokens, self.updated)
+            return wait
+
+        # Estado compartido entre procesos: "<tokens> <timestamp>" bajo flock
+        with open(self.state_file, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            fields = f.read().split()
+            tokens, updated = (float(fields[0]), float(fields[1])) if len(fields) == 2 else (self.burst, time.time())
+            tokens, updated, wait = self._reserve(tokens, updated)
+            f.seek(0)
+            f.truncate()
+            f.write(f"{tokens} {updated}")
+        return wait
+
+
+class _SlotFile:
+    """Semáforo entre procesos: N archivos slot, cada uno tomado con flock no bloqueante."""
+
+    def __init__(self, directory: Path, name: str, size: int):
+        self.paths = [directory / f"{name}.slot{i}" for i in range(size)]
+
+    def try_acquire(self):
+        for path in self.paths:
+            f = open(path, "a")
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return f
+            except OSError:
+                f.close()
+        return None
+
+
+class RateGovernor:
+    """
+    Aplica a cada llamada del cliente el presupuesto de su clase: primero la
+    concurrencia (semáforo en proceso + slot entre procesos) y después la tasa.
+    """
+
+    def __init__(self, limits: dict, state_dir: Path | None):
+        self.limits = limits
+        self.state_dir = state_dir
+        if state_dir is not None:
+            state_dir.mkdir(parents=True, exist_ok=True)
+        self._buckets = {
+            name: _TokenBucket(b["rate"], b["burst"], state_dir / f"{name}.bucket" if state_dir else None)
+            for name, b in limits.items()
+        }
+        self._slots = {
+            name: _SlotFile(state_dir, name, int(b["concurrency"])) if state_dir else None
+            for name, b in limits.items()
+        }
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._loop = None
+        self.stats = {name: {"calls": 0, "waited": 0, "wait_seconds": 0.0} for name in limits}
+
+    def _semaphore(self, op_class: str) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._semaphores.clear()
+            self._loop = loop
+        if op_class not in self._semaphores:
+            self._semaphores[op_class] = asyncio.Semaphore(int(self.limits[op_class]["concurrency"]))
+        return self._semaphores[op_class]
+
+    @asynccontextmanager
+    async def slot(self, method: str):
+        """Espera turno para `method` según su clase de operación."""
+        if method in _UNLIMITED_METHODS:
+            yield
+            return
+
+        op_class = operation_class(method)
+        if op_class not in self.limits:
+            op_class = "default"
+        stats = self.stats[op_class]
+        stats["calls"] += 1
+        started = time.monotonic()
+
+        async with self._semaphore(op_class):
+            slot_file = None
+            slots = self._slots[op_class]
+            if slots is not None:
+                delay = 0.02
+                while (slot_file := slots.try_acquire()) is None:
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, 0.5)
+            try:
+                wait = self._buckets[op_class].reserve()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                waited = time.monotonic() - started
+                if waited > 0.001:
+                    stats["waited"] += 1
+                    stats["wait_seconds"] += waited
+                yield
+            finally:
+                if slot_file is not None:
+                    slot_file.close()
+
+
+_GOVERNOR: RateGovernor | None = None
+_GOVERNOR_LOADED = False
+
+
+def get_governor() -> RateGovernor | None:
+    """Gobernador del proceso, o None si NLM_LIMITS=off."""
+    global _GOVERNOR, _GOVERNOR_LOADED
+    if not _GOVERNOR_LOADED:
+        limits = _load_limits()
+        if limits is not None:
+            _GOVERNOR = RateGovernor(limits, LIMITS_DIR if fcntl else None)
+        _GOVERNOR_LOADED = True
+    return _GOVERNOR
+
+
+# === Resiliencia: clasificación de errores, reintentos, deadline y circuit breaker ===
+
+# Reintentos máximos por llamada (NLM_RETRIES=0 los desactiva) y backoff exponencial con jitter
+MAX_RETRIES = int(os.environ.get("NLM_RETRIES", 3))
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+
+# Tiempo total máximo por llamada (todos los intentos), por clase de operación.
+# wait_for_completion no tiene: ya lleva su propio timeout.
+CALL_DEADLINES = {"chat": 300, "upload": 600, "studio": 300, "list": 120, "default": 300}
+
+# Llamadas que crean algo: solo se reintentan si el servidor seguro que no las procesó
+_NON_IDEMPOTENT_PREFIXES = ("notebooks.create", "notebooks.delete", "sources.add_",
+                            "sources.delete", "artifacts.generate_")
+
+# Circuit breaker: tras N fallos transitorios seguidos, rechazar llamadas durante X segundos
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 30.0
+
+# Los códigos HTTP se miran con _http_status(); aquí solo palabras. "quota" no: una cuota
+# agotada no se arregla reintentando.
+_THROTTLE_MARKERS = ("too many requests", "rate limit", "ratelimit", "resource_exhausted")
+_CONNECT_MARKERS = ("connecterror", "connectionrefused", "connecttimeout", "name or service not known")
+_TRANSIENT_MARKERS = ("timeout", "timed out", "temporarily", "unavailable",
+                      "connection reset", "remoteprotocolerror", "readerror", "networkerror")
+_TRANSIENT_STATUS = {500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """El backend se considera caído: la llamada se rechaza sin intentarla."""
+
+
+def classify_error(exc: BaseException) -> str:
+    """'auth', 'throttled', 'connect', 'transient' o 'fatal'."""
+    if isinstance(exc, CircuitOpenError):
+        return "fatal"
+    if _is_auth_error(exc):
+        return "auth"
+    status = _http_status(exc)
+    text = f"{type(exc).__name__} {exc}".lower()
+    if status == 429 or any(m in text for m in _THROTTLE_MARKERS):
+        return "throttled"
+    if isinstance(exc, ConnectionRefusedError) or any(m in text for m in _CONNECT_MARKERS):
+        return "connect"
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return "transient"
+    if status in _TRANSIENT_STATUS:
+        return "transient"
+    if status is None and any(m in text for m in _TRANSIENT_MARKERS):
+        return "transient"
+    return "fatal"
+
+
+def _is_retryable(method: str, kind: str) -> bool:
+    if kind in ("throttled", "connect"):
+        return True
+    return kind == "transient" and not method.startswith(_NON_IDEMPOTENT_PREFIXES)
+
+
+class CircuitBreaker:
+    """closed → (N fallos seguidos) → open → (cooldown) → half-open → 1 prueba → closed/open."""
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, cooldown: float = BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def check(self):
+        """Lanza CircuitOpenError si no se debe llamar al backend ahora."""
+        state = self.state
+        if state == "open" or (state == "half-open" and self.probing):
+            _STATS["breaker_rejections"] += 1
+            retry_in = max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+            raise CircuitOpenError(f"NotebookLM no responde; circuito abierto (reintentar en {retry_in:.0f}s)")
+        if state == "half-open":
+            self.probing = True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self, kind: str):
+        # Solo los fallos del servidor/red indican caída; 429 y errores de datos no
+        if kind not in ("transient", "connect"):
+            self.probing = False
+            return
+        self.failures += 1
+        if self.probing or self.failures >= self.threshold:
+            if self.opened_at is None or self.probing:
+                _STATS["breaker_trips"] += 1
+            self.opened_at = time.monotonic()
+            self.probing = False
+
+
+_STATS = {
+    "calls": 0, "retries": 0, "gave_up": 0, "deadline_exceeded": 0,
+    "auth_errors": 0, "fatal_errors": 0, "breaker_trips": 0, "breaker_rejections": 0,
+    "coalesced_local": 0, "coalesced_remote": 0,
+}
+_BREAKER = CircuitBreaker()
+
+
+def resilience_stats() -> dict:
+    """Contadores de reintentos, breaker y esperas de cuota del proceso (para monitorización)."""
+    governor = get_governor()
+    return {
+        **_STATS,
+        "breaker_state": _BREAKER.state,
+        "limits": governor.stats if governor else None,
+    }
+
+
+def _backoff(attempt: int) -> float:
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1)))
+
+
+async def _call_with_policy(method: str, first, factory, governor):
+    """Una llamada al backend con cuota, reintentos con backoff, deadline y circuit breaker."""
+    pending = first
+    try:
+        _BREAKER.check()
+        _STATS["calls"] += 1
+        limit = None if method in _UNLIMITED_METHODS else CALL_DEADLINES.get(operation_class(method))
+        deadline = time.monotonic() + limit if limit else None
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                async with (governor.slot(method) if governor else nullcontext()):
+                    coro, pending = pending, None
+                    remaining = deadline - time.monotonic() if deadline else None
+                    if remaining is not None and remaining <= 0:
+                        coro.close()
+                        raise asyncio.TimeoutError(f"deadline de {limit}s agotado: {method}")
+                    result = await asyncio.wait_for(coro, remaining)
+            except Exception as e:
+                kind = classify_error(e)
+                _BREAKER.record_failure(kind)
+                if kind == "auth":
+                    _STATS["auth_errors"] += 1
+                    raise
+                if kind == "fatal":
+                    _STATS["fatal_errors"] += 1
+                    raise
+                delay = _backoff(attempt)
+                out_of_time = deadline is not None and time.monotonic() + delay >= deadline
+                if out_of_time and isinstance(e, asyncio.TimeoutError):
+                    _STATS["deadline_exceeded"] += 1
+                if attempt > MAX_RETRIES or out_of_time or not _is_retryable(method, kind):
+                    _STATS["gave_up"] += 1
+                    raise
+                _STATS["retries"] += 1
+                await asyncio.sleep(delay)
+                _BREAKER.check()
+                pending = factory()
+            else:
+                _BREAKER.record_success()
+                return result
+    finally:
+        if pending is not None and inspect.iscoroutine(pending):
+            pending.close()
+
+
+# === Single-flight: peticiones idénticas simultáneas → una sola llamada ===
+# Dentro del proceso se comparte un Future; entre procesos, quien tiene el lock
+# <clave>.lock hace la llamada y deja el resultado en <clave>.result para los
+# que esperaban. NLM_SINGLE_FLIGHT=0 lo desactiva.
+
+SINGLE_FLIGHT_METHODS = {"chat.ask", "sources.list", "notebooks.list"}
+INFLIGHT_DIR = DATA_DIR / "inflight"
+_INFLIGHT_POLL = 0.05
+# Segundos que se conservan resultados y locks antiguos antes de limpiarlos: más
+# que el deadline más largo, para no limpiar nada de una llamada aún en curso
+_INFLIGHT_TTL = max(CALL_DEADLINES.values()) + 60
+
+
+class _LeaderCancelled(Exception):
+    """La llamada que compartían los demás se canceló: uno de ellos la repite."""
+
+
+class SingleFlight:
+    """Une llamadas idénticas en curso (mismo método y argumentos) en una sola."""
+
+    def __init__(self, directory: Path | None):
+        self.directory = directory
+        self._pending: dict[str, asyncio.Future] = {}
+        self._loop = None
+        self._writes = 0
+
+    @staticmethod
+    def key(method: str, args, kwargs, account: str = "") -> str:
+        # La cuenta (ruta de storage) forma parte de la clave: procesos con
+        # cuentas distintas no deben compartir resultados
+        material = json.dumps([account, method, args, kwargs], sort_keys=True, default=repr)
+        return hashlib.sha256(material.encode()).hexdigest()[:32]
+
+    async def run(self, method: str, args, kwargs, call, account: str = ""):
+        """Devuelve el resultado de call() o el de una llamada idéntica ya en curso."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._pending.clear()
+            self._loop = loop
+
+        key = self.key(method, args, kwargs, account)
+        while (pending := self._pending.get(key)) is not None:
+            try:
+                result = await asyncio.shield(pending)
+            except _LeaderCancelled:
+                continue  # el primero que despierte hace la llamada y los demás esperan a ese
+            _STATS["coalesced_local"] += 1
+            return result
+
+        future = loop.create_future()
+        self._pending[key] = future
+        try:
+            result = await self._run_shared(key, call)
+        except asyncio.CancelledError:
+            # Cancelar el Future cancelaría también a quienes esperan: que relevan al líder
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # marcada como leída aunque nadie más esperara
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._pending.pop(key, None)
+
+    async def _run_shared(self, key: str, call):
+        if self.directory is None:
+            return await call()
+
+        started = time.time()
+        lock, waited = await self._lock(self.directory / f"{key}.lock")
+        with lock:
+            if waited:
+                # Otro proceso hizo la misma llamada mientras esperábamos: usar su resultado
+                found, result = self._read_result(key, started)
+                if found:
+                    _STATS["coalesced_remote"] += 1
+                    return result
+
+            result = await call()
+            self._write_result(key, result)
+            return result
+
+    @staticmethod
+    async def _lock(path: Path):
+        """Abre y bloquea el lock de una clave. Devuelve (archivo, si hubo que esperar)."""
+        waited = False
+        while True:
+            lock = open(path, "a")
+            try:
+                while True:
+                    try:
+                        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        break
+                    except OSError:
+                        waited = True
+                        await asyncio.sleep(_INFLIGHT_POLL)
+                current = os.stat(path)
+            except FileNotFoundError:
+                current = None
+            except BaseException:
+                lock.close()
+                raise
+            # _sweep pudo borrar el archivo mientras esperábamos: bloquear el que está ahora
+            if current is not None and os.path.samestat(os.fstat(lock.fileno()), current):
+                return lock, waited
+            lock.close()
+
+    def _read_result(self, key: str, since: float):
+        try:
+            with open(self.directory / f"{key}.result", "rb") as f:
+                written, result = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            return False, None
+        return (True, result) if written >= since else (False, None)
+
+    def _write_result(self, key: str, result):
+        path = self.directory / f"{key}.result"
+        tmp = path.with_suffix(f".tmp{os.getpid()}")
+        try:
+            with open(tmp, "wb") as f:
+                pickle.dump((time.time(), result), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except (OSError, pickle.PicklingError, TypeError, AttributeError):
+            tmp.unlink(missing_ok=True)
+            return
+        self._writes += 1
+        if self._writes % 50 == 1:
+            self._sweep()
+
+    def _sweep(self):
+        cutoff = time.time() - _INFLIGHT_TTL
+        for entry in os.scandir(self.directory):
+            try:
+                if entry.stat().st_mtime >= cutoff:
+                    continue
+                if entry.name.endswith(".lock"):
+                    self._unlink_lock(entry.path)
+                else:
+                    os.unlink(entry.path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _unlink_lock(path: str):
+        # Solo si nadie lo tiene: borrarlo con un líder dentro dejaría entrar a otro
+        with open(path, "a") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return
+            os.unlink(path)
+
+
+_SINGLE_FLIGHT: SingleFlight | None = None
+_SINGLE_FLIGHT_LOADED = False
+
+
+def get_single_flight() -> SingleFlight | None:
+    """Single-flight del proceso, o None si NLM_SINGLE_FLIGHT=0."""
+    global _SINGLE_FLIGHT, _SINGLE_FLIGHT_LOADED
+    if not _SINGLE_FLIGHT_LOADED:
+        if os.environ.get("NLM_SINGLE_FLIGHT", "1") != "0":
+            directory = None
+            if fcntl is not None:
+                INFLIGHT_DIR.mkdir(parents=True, exist_ok=True)
+                directory = INFLIGHT_DIR
+            _SINGLE_FLIGHT = SingleFlight(directory)
+        _SINGLE_FLIGHT_LOADED = True
+    return _SINGLE_FLIGHT
+
+
+async def _stream_with_policy(method: str, stream, governor):
+    """
+    Como _call_with_policy para respuestas en streaming (chat.ask_stream): cuota
+    durante toda la respuesta y circuit breaker, pero sin reintentos, porque los
+    fragmentos ya entregados no se pueden deshacer.
+    """
+    _BREAKER.check()
+    _STATS["calls"] += 1
+    try:
+        async with (governor.slot(method) if governor else nullcontext()):
+            async for item in stream:
+                yield item
+    except Exception as e:
+        _BREAKER.record_failure(classify_error(e))
+        raise
+    else:
+        _BREAKER.record_success()
+    finally:
+        if hasattr(stream, "aclose"):
+            await stream.aclose()
+
+
+class _GovernedNamespace:
+    """Namespace del cliente (notebooks, sources, chat, artifacts) con llamadas gobernadas."""
+
+    def __init__(self, target, name: str, governor: RateGovernor | None, account: str = ""):
+        self._target = target
+        self._name = name
+        self._governor = governor
+        self._account = account
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+        method = f"{self._name}.{name}"
+        governor = self._governor
+        account = self._account
+
+        def _call(*args, **kwargs):
+            single_flight = get_single_flight() if method in SINGLE_FLIGHT_METHODS else None
+            if single_flight is not None:
+                return single_flight.run(method, args, kwargs, lambda: _call_with_policy(
+                    method, attr(*args, **kwargs), lambda: attr(*args, **kwargs), governor), account)
+
+            result = attr(*args, **kwargs)
+            if hasattr(result, "__aiter__"):
+                return _stream_with_policy(method, result, governor)
+            if not inspect.isawaitable(result):
+                return result
+            return _call_with_policy(method, result, lambda: attr(*args, **kwargs), governor)
+
+        _call.__name__ = name
+        # inspect.signature(_call) describe el método real (p. ej. para ver si admite `limit`)
+        _call.__wrapped__ = attr
+        return _call
+
+
+class GovernedClient:
+    """
+    Envuelve un NotebookLMClient para que todas sus llamadas pasen por
+    RateGovernor (si hay límites) y por la política de reintentos y breaker.
+    """
+
+    def __init__(self, client, governor: RateGovernor | None, account: str = ""):
+        self._client = client
+        self._governor = governor
+        self._account = account
+
+    async def __aenter__(self):
+        self._client = await self._client.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc):
+        return await self._client.__aexit__(*exc)
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name.startswith("_") or callable(attr):
+            return attr
+        return _GovernedNamespace(attr, name, self._governor, self._account)
+
+
+def _govern(client, account: str = ""):
+    return GovernedClient(client, get_governor(), account)
+
+
+@asynccontextmanager
+async def borrow_client(storage_path: Path | None = None):
+    """Presta un cliente abierto (daemon si está activo, si no el pool del proceso)."""
+    if storage_path is None:
+        from nlm_daemon import connect_remote
+        remote = await connect_remote()
+        if remote is not None:
+            yield remote
+            return
+    async with _POOL.borrow(storage_path) as client:
+        yield client
 
 
 def run_async(coro):
     """Ejecuta una corrutina de forma síncrona. Punto de entrada para todos los scripts nlm_*."""
-    return asyncio.run(coro)
+
+    async def _main():
+        try:
+            return await coro
+        finally:
+            await _POOL.close_all()
+            if os.environ.get("NLM_STATS"):
+                print(f"NLM_STATS: {json.dumps(resilience_stats())}", file=sys.stderr)
+
+    return asyncio.run(_main())
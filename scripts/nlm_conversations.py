@@ -0,0 +1,85 @@
+"""
+Conversaciones locales por notebook (tablas `conversations` y `turns` de nlm_store).
+
+Cada notebook tiene un hilo por defecto ("") y los hilos con nombre que se
+creen con `ask --thread NOMBRE`. Por hilo se guarda el conversation_id en
+curso; por notebook, los últimos MAX_TURNS turnos (pregunta y respuesta)
+para `ask --continue` y `history` sin llamar a NotebookLM.
+"""
+
+import time
+
+import nlm_store
+
+DEFAULT_THREAD = ""
+MAX_TURNS = 500
+
+
+def current(notebook_id: str, thread: str = DEFAULT_THREAD) -> str | None:
+    """conversation_id en curso del hilo, o None si no hay ninguno."""
+    row = nlm_store.connect().execute(
+        "SELECT conversation_id FROM conversations WHERE notebook_id = ? AND thread = ?",
+        (notebook_id, thread),
+    ).fetchone()
+    return row[0] if row else None
+
+
+def record_turn(notebook_id: str, question: str, data: dict, thread: str = DEFAULT_THREAD):
+    """Registra un turno (dict de _response_to_dict) y lo deja como conversación en curso del hilo."""
+    if not data.get("conversation_id"):
+        return
+    conn = nlm_store.connect()
+    now = time.time()
+    with conn:
+        conn.execute(
+            "INSERT INTO conversations (notebook_id, thread, conversation_id, turns, updated_at) "
+            "VALUES (?, ?, ?, 1, ?) "
+            "ON CONFLICT(notebook_id, thread) DO UPDATE SET "
+            "  turns = CASE WHEN conversation_id = excluded.conversation_id THEN turns + 1 ELSE 1 END, "
+            "  conversation_id = excluded.conversation_id, updated_at = excluded.updated_at",
+            (notebook_id, thread, data["conversation_id"], now),
+        )
+        conn.execute(
+            "INSERT INTO turns (notebook_id, thread, conversation_id, turn, question, answer, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (notebook_id, thread, data["conversation_id"], data.get("turn"), question, data["answer"], now),
+        )
+        conn.execute(
+            "DELETE FROM turns WHERE notebook_id = ? AND id <= ("
+            "  SELECT id FROM turns WHERE notebook_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+            (notebook_id, notebook_id, MAX_TURNS),
+        )
+
+
+def recent_turns(notebook_id: str, limit: int = 20, thread: str = None) -> list[dict]:
+    """Últimos `limit` turnos del notebook (o de un hilo), del más antiguo al más reciente."""
+    query = "SELECT thread, conversation_id, turn, question, answer, created_at FROM turns WHERE notebook_id = ?"
+    params = [notebook_id]
+    if thread is not None:
+        query += " AND thread = ?"
+        params.append(thread)
+    rows = nlm_store.connect().execute(query + " ORDER BY id DESC LIMIT ?", (*params, limit)).fetchall()
+    keys = ("thread", "conversation_id", "turn", "question", "answer", "created_at")
+    return [dict(zip(keys, row)) for row in reversed(rows)]
+
+
+def threads(notebook_id: str) -> list[dict]:
+    """Hilos del notebook con su conversación en curso, del más reciente al más antiguo."""
+    rows = nlm_store.connect().execute(
+        "SELECT thread, conversation_id, turns, updated_at FROM conversations "
+        "WHERE notebook_id = ? ORDER BY updated_at DESC",
+        (notebook_id,),
+    )
+    keys = ("thread", "conversation_id", "turns", "updated_at")
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def forget(notebook_id: str, thread: str = None):
+    """Olvida un hilo (la próxima pregunta empieza conversación nueva) o todo el notebook."""
+    conn = nlm_store.connect()
+    with conn:
+        if thread is None:
+            conn.execute("DELETE FROM conversations WHERE notebook_id = ?", (notebook_id,))
+            conn.execute("DELETE FROM turns WHERE notebook_id = ?", (notebook_id,))
+        else:
+            conn.execute("DELETE FROM conversations WHERE notebook_id = ? AND thread = ?", (notebook_id, thread))
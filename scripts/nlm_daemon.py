@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Daemon local que mantiene un NotebookLMClient autenticado entre comandos.
+Los scripts nlm_* lo usan de forma transparente a través de _create_client();
+si el daemon no está activo, el cliente se crea en proceso como siempre.
+Comandos: start, stop, status, serve
+"""
+
+import argparse
+import asyncio
+import os
+import pickle
+import signal
+import struct
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from nlm_client import NLM_HOME, get_pool, resilience_stats, run_async
+
+SOCKET_PATH = Path(os.environ.get("NLM_DAEMON_SOCKET", NLM_HOME / "nlmd.sock"))
+LOG_FILE = NLM_HOME / "nlmd.log"
+
+# Segundos sin peticiones antes de que el daemon se apague solo
+IDLE_TIMEOUT = 1800
+
+# Cada mensaje: longitud (4 bytes, big-endian) + payload pickle.
+# El socket se crea con permisos 0600: solo el propio usuario puede hablar con él.
+_HEADER = struct.Struct("!I")
+
+
+async def _send(writer, obj):
+    data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    writer.write(_HEADER.pack(len(data)) + data)
+    await writer.drain()
+
+
+async def _recv(reader):
+    (size,) = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+    return pickle.loads(await reader.readexactly(size))
+
+
+async def _request(message: dict, timeout: float | None = None) -> dict:
+    """Envía un mensaje al daemon y devuelve su respuesta."""
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_unix_connection(str(SOCKET_PATH)), timeout
+    )
+    try:
+        await _send(writer, message)
+        return await asyncio.wait_for(_recv(reader), timeout)
+    finally:
+        writer.close()
+
+
+# === Lado cliente ===
+
+# Métodos que devuelven un iterador asíncrono: no caben en una petición/respuesta,
+# así que el proxy no los ofrece y el llamador usa la variante sin streaming.
+_STREAMING_METHODS = {"chat.ask_stream"}
+
+class RemoteClient:
+    """Proxy del cliente del daemon: client.chat.ask(...) se convierte en una llamada RPC."""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        # El cliente real pertenece al daemon; aquí no hay nada que cerrar
+        return False
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return _RemoteNamespace(name)
+
+
+class _RemoteNamespace:
+    """Namespace remoto (notebooks, sources, chat, artifacts)."""
+
+    def __init__(self, name: str):
+        self._name = name
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        method = f"{self._name}.{name}"
+        if method in _STREAMING_METHODS:
+            raise AttributeError(name)
+
+        async def _call(*args, **kwargs):
+            reply = await _request({"op": "call", "method": method, "args": args, "kwargs": kwargs})
+            if reply["ok"]:
+                return reply["result"]
+            raise reply["error"]
+
+        _call.__name__ = name
+        return _call
+
+
+async def connect_remote() -> RemoteClient | None:
+    """Devuelve un proxy si el daemon responde, o None para usar el cliente en proceso."""
+    if os.environ.get("NLM_NO_DAEMON") or not SOCKET_PATH.exists():
+        return None
+    try:
+        reply = await _request({"op": "ping"}, timeout=1.0)
+    except (OSError, EOFError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+        return None
+    return RemoteClient() if reply.get("ok") else None
+
+
+# === Lado servidor ===
+
+class DaemonServer:
+    """Mantiene un cliente abierto y atiende peticiones por el socket Unix."""
+
+    def __init__(self, idle_timeout: float = IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self.started_at = time.time()
+        self.last_activity = time.monotonic()
+        self.requests = 0
+        self.errors = 0
+        self.stopping = asyncio.Event()
+
+    async def _call(self, method: str, args, kwargs):
+        async with get_pool().borrow() as client:
+            target = client
+            for part in method.split("."):
+                if part.startswith("_"):
+                    raise AttributeError(f"Método no permitido: {method}")
+                target = getattr(target, part)
+            return await target(*args, **kwargs)
+
+    def _status(self) -> dict:
+        return {
+            "ok": True,
+            "pid": os.getpid(),
+            "uptime": time.time() - self.started_at,
+            "requests": self.requests,
+            "errors": self.errors,
+            "clients_open": len(get_pool()),
+            "resilience": resilience_stats(),
+        }
+
+    async def handle(self, reader, writer):
+        try:
+            message = await _recv(reader)
+        except (EOFError, asyncio.IncompleteReadError, pickle.UnpicklingError):
+            writer.close()
+            return
+
+        self.last_activity = time.monotonic()
+        op = message.get("op")
+        try:
+            if op == "ping":
+                reply = {"ok": True}
+            elif op == "status":
+                reply = self._status()
+            elif op == "stop":
+                reply = {"ok": True}
+                self.stopping.set()
+            elif op == "call":
+                self.requests += 1
+                try:
+                    result = await self._call(message["method"], message["args"], message["kwargs"])
+                except SystemExit:
+                    raise RuntimeError("No se encontró storage_state.json (nlm_auth.py setup)")
+                reply = {"ok": True, "result": result}
+            else:
+                reply = {"ok": False, "error": ValueError(f"Operación desconocida: {op}")}
+        except Exception as e:
+            self.errors += 1
+            reply = {"ok": False, "error": e}
+
+        try:
+            try:
+                await _send(writer, reply)
+            except (pickle.PicklingError, TypeError, AttributeError):
+                # Resultado o excepción no serializable: devolver un error legible
+                await _send(writer, {"ok": False, "error": RuntimeError(repr(reply.get("error") or reply))})
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            writer.close()
+
+    async def _watch_idle(self):
+        pool = get_pool()
+        while not self.stopping.is_set():
+            await asyncio.sleep(min(30, self.idle_timeout, pool.idle_timeout))
+            await pool.sweep()
+            if time.monotonic() - self.last_activity > self.idle_timeout:
+                print(f"Inactivo {self.idle_timeout:.0f}s, apagando", flush=True)
+                self.stopping.set()
+
+    async def serve(self):
+        SOCKET_PATH.parent.mkdir(parents=True, exist_ok=True)
+        if SOCKET_PATH.exists():
+            SOCKET_PATH.unlink()
+
+        old_umask = os.umask(0o177)
+        try:
+            server = await asyncio.start_unix_server(self.handle, path=str(SOCKET_PATH))
+        finally:
+            os.umask(old_umask)
+
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, self.stopping.set)
+
+        print(f"nlmd escuchando en {SOCKET_PATH} (pid {os.getpid()})", flush=True)
+        watcher = asyncio.create_task(self._watch_idle())
+        try:
+            await self.stopping.wait()
+        finally:
+            watcher.cancel()
+            server.close()
+            await server.wait_closed()
+            await get_pool().close_all()
+            if SOCKET_PATH.exists():
+                SOCKET_PATH.unlink()
+        return 0
+
+
+def _ping() -> dict | None:
+    try:
+        return asyncio.run(_request({"op": "status"}, timeout=1.0))
+    except (OSError, EOFError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+        return None
+
+
+def cmd_serve(idle_timeout: float):
+    """Ejecuta el daemon en primer plano."""
+    if _ping():
+        print(f"ERROR: Ya hay un daemon activo en {SOCKET_PATH}")
+        return 1
+    return run_async(DaemonServer(idle_timeout).serve())
+
+
+def cmd_start(idle_timeout: float):
+    """Arranca el daemon en segundo plano y espera a que responda."""
+    status = _ping()
+    if status:
+        print(f"YA ACTIVO: pid {status['pid']} en {SOCKET_PATH}")
+        return 0
+
+    LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(LOG_FILE, "a") as log:
+        subprocess.Popen(
+            [sys.executable, str(Path(__file__).resolve()), "serve", "--idle-timeout", str(idle_timeout)],
+            stdin=subprocess.DEVNULL, stdout=log, stderr=log,
+            start_new_session=True,
+        )
+
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        status = _ping()
+        if status:
+            print(f"INICIADO: pid {status['pid']} en {SOCKET_PATH}")
+            return 0
+        time.sleep(0.1)
+
+    print(f"ERROR: El daemon no respondió. Revisa el log: {LOG_FILE}")
+    return 1
+
+
+def cmd_stop():
+    """Detiene el daemon."""
+    if not _ping():
+        print("NO ACTIVO")
+        return 0
+    asyncio.run(_request({"op": "stop"}, timeout=5.0))
+    print("DETENIDO")
+    return 0
+
+
+def cmd_status():
+    """Muestra el estado del daemon."""
+    status = _ping()
+    if not status:
+        print("NO ACTIVO")
+        print("  Arranca con: python scripts/run.py nlm_daemon.py start")
+        return 1
+    print(f"ACTIVO: pid {status['pid']} en {SOCKET_PATH}")
+    print(f"  Uptime: {status['uptime']:.0f}s")
+    print(f"  Peticiones: {status['requests']} ({status['errors']} errores)")
+    print(f"  Clientes abiertos: {status['clients_open']}")
+    res = status["resilience"]
+    print(f"  Reintentos: {res['retries']} ({res['gave_up']} abandonadas, "
+          f"{res['deadline_exceeded']} por deadline)")
+    print(f"  Circuit breaker: {res['breaker_state']} ({res['breaker_trips']} aperturas, "
+          f"{res['breaker_rejections']} rechazadas)")
+    print(f"  Llamadas unidas: {res['coalesced_local']} en proceso, {res['coalesced_remote']} entre procesos")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Daemon persistente de NotebookLM")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for name, help_text in (("start", "Arrancar en segundo plano"), ("serve", "Ejecutar en primer plano")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT,
+                       help=f"Apagar tras N segundos sin peticiones (default: {IDLE_TIMEOUT})")
+    sub.add_parser("stop", help="Detener el daemon")
+    sub.add_parser("status", help="Estado del daemon")
+
+    args = parser.parse_args()
+
+    if args.command == "start":
+        sys.exit(cmd_start(args.idle_timeout))
+    elif args.command == "serve":
+        sys.exit(cmd_serve(args.idle_timeout))
+    elif args.command == "stop":
+        sys.exit(cmd_stop())
+    elif args.command == "status":
+        sys.exit(cmd_status())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,491 @@
+#!/usr/bin/env python3
+"""
+Backend falso de NotebookLM, en proceso y sin red, para tests y benchmarks.
+Imita la parte de NotebookLMClient que usan los scripts nlm_*.
+
+Se activa con NLM_FAKE_BACKEND=1 (lo selecciona _open_client()). Configuración:
+  NLM_FAKE_STATE       JSON donde persistir notebooks/fuentes entre procesos
+  NLM_FAKE_NOTEBOOKS   Nº de notebooks de ejemplo si el estado está vacío
+  NLM_FAKE_LATENCY     Latencia por clase de operación, p. ej.
+                       "chat=lognormal:2,0.5;upload=uniform:0.2,1;default=fixed:0.05"
+                       (distribuciones: fixed:S, uniform:MIN,MAX, lognormal:MEDIANA,SIGMA)
+  NLM_FAKE_PROCESSING  Tiempo que una fuente nueva tarda en estar lista (misma sintaxis)
+  NLM_FAKE_FAIL_RATE   Probabilidad de error transitorio (500) por llamada
+  NLM_FAKE_RATE_LIMIT  Máximo de llamadas por segundo antes de responder 429
+  NLM_FAKE_SEED        Semilla para latencias y fallos reproducibles
+"""
+
+import asyncio
+import json
+import math
+import os
+import random
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from enum import Enum
+from pathlib import Path
+
+from nlm_client import OPERATION_CLASSES, operation_class
+
+
+# === Errores ===
+
+class FakeBackendError(Exception):
+    """Error transitorio del servidor (equivalente a un 500)."""
+
+
+class FakeRateLimitError(FakeBackendError):
+    """Cuota superada (equivalente a un 429)."""
+
+
+class FakeNotFoundError(Exception):
+    """Recurso inexistente."""
+
+
+# === Enums de configuración (mismos miembros que los de notebooklm-py que usamos) ===
+
+class ChatGoal(Enum):
+    DEFAULT = 1
+    CUSTOM = 2
+    LEARNING_GUIDE = 3
+
+
+class ChatResponseLength(Enum):
+    DEFAULT = 1
+    LONGER = 4
+    SHORTER = 5
+
+
+# === Tipos devueltos (mismos atributos que los de notebooklm-py que usamos) ===
+
+@dataclass
+class Notebook:
+    id: str
+    title: str
+    sources_count: int = 0
+
+
+@dataclass
+class NotebookDescription:
+    summary: str
+
+
+@dataclass
+class Source:
+    id: str
+    title: str
+    kind: str
+    status: str = "ready"
+
+    @property
+    def is_ready(self) -> bool:
+        return self.status == "ready"
+
+
+@dataclass
+class ChatReference:
+    source_id: str
+    citation_number: int
+    cited_text: str
+
+
+@dataclass
+class ChatResponse:
+    answer: str
+    conversation_id: str
+    turn_number: int
+    is_follow_up: bool = False
+    references: list = field(default_factory=list)
+
+
+@dataclass
+class ConversationTurn:
+    question: str
+    answer: str
+    conversation_id: str
+    turn_number: int
+    is_follow_up: bool = False
+
+    def __str__(self):
+        return f"{self.question} → {self.answer}"
+
+
+@dataclass
+class GenerationStatus:
+    task_id: str
+    status: str
+
+    @property
+    def is_complete(self) -> bool:
+        return self.status == "completed"
+
+    @property
+    def is_failed(self) -> bool:
+        return self.status == "failed"
+
+
+@dataclass
+class Artifact:
+    id: str
+    kind: str
+    title: str
+    is_completed: bool = True
+
+
+# === Distribuciones de latencia ===
+
+def parse_distribution(spec: str):
+    """'fixed:0.1' | 'uniform:0.05,0.2' | 'lognormal:2,0.5' → función rng → segundos."""
+    spec = (spec or "").strip()
+    if not spec or spec == "0":
+        return lambda rng: 0.0
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v] if params else []
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal":
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1])
+    if not params:
+        seconds = float(kind)
+        return lambda rng: seconds
+    raise ValueError(f"Distribución desconocida: {spec}")
+
+
+def parse_latencies(spec: str) -> dict:
+    """'chat=lognormal:2,0.5;default=fixed:0.05' → {clase: distribución}."""
+    spec = (spec or "").strip()
+    if spec and "=" not in spec:
+        spec = f"default={spec}"
+    latencies = {}
+    for part in filter(None, (p.strip() for p in spec.split(";"))):
+        op_class, _, dist = part.partition("=")
+        latencies[op_class.strip()] = parse_distribution(dist)
+    default = latencies.setdefault("default", parse_distribution("0"))
+    for op_class in OPERATION_CLASSES:
+        latencies.setdefault(op_class, default)
+    return latencies
+
+
+# === Backend ===
+
+class FakeBackend:
+    """Estado y comportamiento compartidos por los namespaces del cliente falso."""
+
+    def __init__(self, state_file: Path | None = None, latency: str = "", processing: str = "",
+                 fail_rate: float = 0.0, rate_limit: float = 0.0, seed: int | None = None,
+                 seed_notebooks: int = 0):
+        self.rng = random.Random(seed)
+        self.state_file = state_file
+        self.latencies = parse_latencies(latency)
+        self.processing = parse_distribution(processing)
+        self.fail_rate = fail_rate
+        self.rate_limit = rate_limit
+        self.calls: deque[float] = deque()
+        self.call_count = 0
+        self.state = self._load()
+        if not self.state["notebooks"] and seed_notebooks:
+            for i in range(seed_notebooks):
+                self.new_notebook(f"Notebook de ejemplo {i + 1}")
+            self.save()
+
+    @classmethod
+    def from_env(cls) -> "FakeBackend":
+        env = os.environ
+        seed = env.get("NLM_FAKE_SEED")
+        state = env.get("NLM_FAKE_STATE")
+        return cls(
+            state_file=Path(state).expanduser() if state else None,
+            latency=env.get("NLM_FAKE_LATENCY", ""),
+            processing=env.get("NLM_FAKE_PROCESSING", ""),
+            fail_rate=float(env.get("NLM_FAKE_FAIL_RATE", 0)),
+            rate_limit=float(env.get("NLM_FAKE_RATE_LIMIT", 0)),
+            seed=int(seed) if seed else None,
+            seed_notebooks=int(env.get("NLM_FAKE_NOTEBOOKS", 0)),
+        )
+
+    def _load(self) -> dict:
+        if self.state_file and self.state_file.exists():
+            return json.loads(self.state_file.read_text())
+        return {"notebooks": {}, "tasks": {}}
+
+    def save(self):
+        if self.state_file:
+            self.state_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.state_file.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self.state, ensure_ascii=False))
+            tmp.replace(self.state_file)
+
+    def new_id(self) -> str:
+        # Siempre aleatorio: con semilla fija se repetirían IDs entre procesos
+        return str(uuid.uuid4())
+
+    def new_notebook(self, title: str) -> dict:
+        nb = {"id": self.new_id(), "title": title, "sources": [], "history": [], "config": {}}
+        self.state["notebooks"][nb["id"]] = nb
+        return nb
+
+    def notebook(self, notebook_id: str) -> dict:
+        try:
+            return self.state["notebooks"][notebook_id]
+        except KeyError:
+            raise FakeNotFoundError(f"Notebook no encontrado: {notebook_id}") from None
+
+    async def call(self, method: str, delay: float = None):
+        """Simula latencia (o `delay` si se indica), límite de cuota y fallos de la llamada `method`."""
+        self.call_count += 1
+        now = time.monotonic()
+        if self.rate_limit:
+            while self.calls and now - self.calls[0] > 1.0:
+                self.calls.popleft()
+            if len(self.calls) >= self.rate_limit:
+                raise FakeRateLimitError(f"429 Too Many Requests: {method}")
+            self.calls.append(now)
+
+        if delay is None:
+            delay = self.latencies[operation_class(method)](self.rng)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if self.fail_rate and self.rng.random() < self.fail_rate:
+            raise FakeBackendError(f"500 Internal Server Error: {method}")
+
+
+def _source_obj(src: dict) -> Source:
+    status = "ready" if time.time() >= src.get("ready_at", 0) else "processing"
+    return Source(id=src["id"], title=src["title"], kind=src["kind"], status=status)
+
+
+def _notebook_obj(nb: dict) -> Notebook:
+    return Notebook(id=nb["id"], title=nb["title"], sources_count=len(nb["sources"]))
+
+
+class _Notebooks:
+    def __init__(self, backend: FakeBackend):
+        self._b = backend
+
+    async def list(self):
+        await self._b.call("notebooks.list")
+        return [_notebook_obj(nb) for nb in self._b.state["notebooks"].values()]
+
+    async def create(self, title: str):
+        await self._b.call("notebooks.create")
+        nb = self._b.new_notebook(title)
+        self._b.save()
+        return _notebook_obj(nb)
+
+    async def get(self, notebook_id: str):
+        await self._b.call("notebooks.get")
+        return _notebook_obj(self._b.notebook(notebook_id))
+
+    async def get_description(self, notebook_id: str):
+        await self._b.call("notebooks.get_description")
+        nb = self._b.notebook(notebook_id)
+        return NotebookDescription(summary=f"{nb['title']}: {len(nb['sources'])} fuentes.")
+
+    async def delete(self, notebook_id: str):
+        await self._b.call("notebooks.delete")
+        removed = self._b.state["notebooks"].pop(notebook_id, None)
+        self._b.save()
+        return removed is not None
+
+
+class _Sources:
+    def __init__(self, backend: FakeBackend):
+        self._b = backend
+
+    def _add(self, notebook_id: str, kind: str, title: str) -> Source:
+        nb = self._b.notebook(notebook_id)
+        src = {
+            "id": self._b.new_id(), "title": title, "kind": kind,
+            "ready_at": time.time() + self._b.processing(self._b.rng),
+        }
+        nb["sources"].append(src)
+        self._b.save()
+        return _source_obj(src)
+
+    async def list(self, notebook_id: str):
+        await self._b.call("sources.list")
+        return [_source_obj(s) for s in self._b.notebook(notebook_id)["sources"]]
+
+    async def add_url(self, notebook_id: str, url: str):
+        await self._b.call("sources.add_url")
+        return self._add(notebook_id, "web_page", url)
+
+    async def add_youtube(self, notebook_id: str, url: str):
+        await self._b.call("sources.add_youtube")
+        return self._add(notebook_id, "youtube", url)
+
+    async def add_file(self, notebook_id: str, path):
+        await self._b.call("sources.add_file")
+        return self._add(notebook_id, "file", Path(path).name)
+
+    async def add_text(self, notebook_id: str, title: str, text: str):
+        await self._b.call("sources.add_text")
+        return self._add(notebook_id, "pasted_text", title)
+
+    async def add_drive(self, notebook_id: str, file_id: str, title: str, mime_type: str = None):
+        await self._b.call("sources.add_drive")
+        return self._add(notebook_id, "google_docs", title)
+
+    async def delete(self, notebook_id: str, source_id: str):
+        await self._b.call("sources.delete")
+        nb = self._b.notebook(notebook_id)
+        before = len(nb["sources"])
+        nb["sources"] = [s for s in nb["sources"] if s["id"] != source_id]
+        self._b.save()
+        return len(nb["sources"]) < before
+
+
+class _Chat:
+    # Palabras por fragmento en ask_stream
+    STREAM_WORDS = 4
+
+    def __init__(self, backend: FakeBackend):
+        self._b = backend
+
+    def _answer(self, notebook_id: str, question: str, source_ids=None, conversation_id=None):
+        nb = self._b.notebook(notebook_id)
+        sources = [s for s in nb["sources"] if not source_ids or s["id"] in source_ids]
+        cited = sources[:3]
+        answer = (f"Respuesta simulada a «{question}» a partir de {len(sources)} fuentes"
+                  + "".join(f" [{i + 1}]" for i in range(len(cited))) + ".")
+        references = [
+            ChatReference(source_id=s["id"], citation_number=i + 1,
+                          cited_text=f"Fragmento de «{s['title']}» relacionado con la pregunta.")
+            for i, s in enumerate(cited)
+        ]
+        turns = [t for t in nb["history"] if t["conversation_id"] == conversation_id]
+        conv_id = conversation_id or self._b.new_id()
+        turn = {"question": question, "answer": answer, "conversation_id": conv_id,
+                "turn_number": len(turns) + 1, "is_follow_up": bool(conversation_id)}
+        nb["history"].append(turn)
+        self._b.save()
+        return ChatResponse(answer=answer, conversation_id=conv_id, turn_number=turn["turn_number"],
+                            is_follow_up=turn["is_follow_up"], references=references)
+
+    async def ask(self, notebook_id: str, question: str, source_ids=None, conversation_id=None):
+        await self._b.call("chat.ask")
+        return self._answer(notebook_id, question, source_ids, conversation_id)
+
+    async def ask_stream(self, notebook_id: str, question: str, source_ids=None, conversation_id=None):
+        """
+        Como ask, pero entrega la respuesta en fragmentos de texto: el primero
+        llega al 20% de la latencia de chat y el resto se reparte el tiempo
+        restante. El último elemento es el ChatResponse completo.
+        """
+        total = self._b.latencies["chat"](self._b.rng)
+        await self._b.call("chat.ask_stream", delay=total * 0.2)
+        response = self._answer(notebook_id, question, source_ids, conversation_id)
+        words = response.answer.split(" ")
+        chunks = [" ".join(words[i:i + self.STREAM_WORDS]) for i in range(0, len(words), self.STREAM_WORDS)]
+        pause = total * 0.8 / len(chunks)
+        for i, chunk in enumerate(chunks):
+            if i:
+                await asyncio.sleep(pause)
+            yield chunk if i == len(chunks) - 1 else chunk + " "
+        yield response
+
+    async def get_history(self, notebook_id: str, limit: int | None = None):
+        await self._b.call("chat.get_history")
+        history = [ConversationTurn(**t) for t in self._b.notebook(notebook_id)["history"]]
+        return history[-limit:] if limit else history
+
+    async def configure(self, notebook_id: str, goal=None, response_length=None, custom_prompt=None):
+        await self._b.call("chat.configure")
+        config = self._b.notebook(notebook_id)["config"]
+        for key, value in (("goal", goal), ("response_length", response_length),
+                           ("custom_prompt", custom_prompt)):
+            if value is not None:
+                config[key] = str(getattr(value, "name", value))
+        self._b.save()
+        return True
+
+
+class _Artifacts:
+    # Tipos de Studio: generate_<tipo>, download_<tipo>, list_<plural>
+    KINDS = {
+        "audio": "audio", "video": "video", "quiz": "quizzes", "flashcards": "flashcards",
+        "report": "reports", "slide_deck": "slide_decks", "infographic": "infographics",
+        "data_table": "data_tables", "mind_map": "mind_maps",
+    }
+
+    def __init__(self, backend: FakeBackend):
+        self._b = backend
+
+    def __getattr__(self, name):
+        prefix, _, kind = name.partition("_")
+        if prefix == "generate" and kind in self.KINDS:
+            return lambda notebook_id, **kw: self._generate(notebook_id, kind)
+        if prefix == "download" and kind in self.KINDS:
+            return lambda notebook_id, output_path, **kw: self._download(notebook_id, kind, output_path)
+        if prefix == "list":
+            for singular, plural in self.KINDS.items():
+                if kind in (singular, plural):
+                    return lambda notebook_id: self._list(notebook_id, singular)
+        raise AttributeError(name)
+
+    async def _generate(self, notebook_id: str, kind: str):
+        await self._b.call(f"artifacts.generate_{kind}")
+        self._b.notebook(notebook_id)
+        task_id = self._b.new_id()
+        # El mapa mental es síncrono: vuelve ya generado
+        done = kind == "mind_map"
+        self._b.state["tasks"][task_id] = {"notebook_id": notebook_id, "kind": kind, "completed": done}
+        self._b.save()
+        return GenerationStatus(task_id=task_id, status="completed" if done else "in_progress")
+
+    async def wait_for_completion(self, notebook_id: str, task_id: str, timeout: float = 300,
+                                  poll_interval: float = None, initial_interval: float = None):
+        await self._b.call("artifacts.wait_for_completion")
+        task = self._b.state["tasks"].get(task_id)
+        if task is None:
+            return GenerationStatus(task_id=task_id, status="failed")
+        task["completed"] = True
+        self._b.save()
+        return GenerationStatus(task_id=task_id, status="completed")
+
+    async def _download(self, notebook_id: str, kind: str, output_path: str):
+        await self._b.call(f"artifacts.download_{kind}")
+        path = Path(output_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({"notebook_id": notebook_id, "kind": kind, "fake": True}))
+        return str(path)
+
+    async def _list(self, notebook_id: str, kind: str | None = None):
+        await self._b.call("artifacts.list")
+        return [
+            Artifact(id=task_id, kind=task["kind"], title=f"{task['kind']} simulado",
+                     is_completed=task.get("completed", False))
+            for task_id, task in self._b.state["tasks"].items()
+            if task["notebook_id"] == notebook_id and kind in (None, task["kind"])
+        ]
+
+    async def list(self, notebook_id: str):
+        return await self._list(notebook_id)
+
+
+class FakeNotebookLMClient:
+    """Sustituto de NotebookLMClient con la misma interfaz async."""
+
+    def __init__(self, backend: FakeBackend | None = None):
+        self.backend = backend or FakeBackend()
+        self.notebooks = _Notebooks(self.backend)
+        self.sources = _Sources(self.backend)
+        self.chat = _Chat(self.backend)
+        self.artifacts = _Artifacts(self.backend)
+
+    @classmethod
+    def from_env(cls) -> "FakeNotebookLMClient":
+        return cls(FakeBackend.from_env())
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.backend.save()
+        return False
@@ -0,0 +1,173 @@
+"""
+Espejo local del historial de chat de cada notebook (tabla `history` de nlm_store).
+
+sync() solo guarda los turnos que aún no están en el espejo: pide los
+HISTORY_PAGE más recientes y, si ninguno es conocido, multiplica el límite
+hasta dar con alguno o recibir el historial entero. Los repetidos se
+descartan por clave (conversación, turno y hash) en toda la página, sin
+suponer que NotebookLM devuelva los turnos en orden.
+Cada turno se guarda comprimido (zlib) y se lee con iter_history(), un
+generador paginado que no carga el historial completo en memoria.
+"""
+
+import hashlib
+import inspect
+import json
+import time
+import zlib
+
+import nlm_store
+
+HISTORY_PAGE = 20
+READ_PAGE = 500
+
+
+def _turn_to_dict(turn) -> dict:
+    """ConversationTurn → dict (tolera turnos sin question/answer usando su texto)."""
+    question = getattr(turn, "question", None)
+    answer = getattr(turn, "answer", None)
+    if question is None and answer is None:
+        question, answer = "", str(turn)
+    return {
+        "conversation_id": getattr(turn, "conversation_id", None),
+        "turn": getattr(turn, "turn_number", None),
+        "is_follow_up": bool(getattr(turn, "is_follow_up", False)),
+        "question": question or "",
+        "answer": answer or "",
+    }
+
+
+def _turn_key(item: dict) -> str:
+    digest = hashlib.sha1(f"{item['question']}\0{item['answer']}".encode()).hexdigest()[:16]
+    return f"{item['conversation_id']}:{item['turn']}:{digest}"
+
+
+def _accepts_limit(method) -> bool | None:
+    """¿get_history admite `limit`? None si la firma no lo dice (proxy del daemon)."""
+    try:
+        params = inspect.signature(method).parameters
+    except (TypeError, ValueError):
+        return None
+    if "limit" in params:
+        return True
+    if any(p.kind is inspect.Parameter.VAR_KEYWORD for p in params.values()):
+        return None
+    return False
+
+
+def _known_keys(notebook_id: str, keys: list[str]) -> set[str]:
+    """Las de `keys` que ya están en el espejo."""
+    conn = nlm_store.connect()
+    known = set()
+    for start in range(0, len(keys), READ_PAGE):
+        chunk = keys[start:start + READ_PAGE]
+        known.update(row[0] for row in conn.execute(
+            f"SELECT key FROM history WHERE notebook_id = ? AND key IN ({', '.join('?' * len(chunk))})",
+            (notebook_id, *chunk),
+        ))
+    return known
+
+
+async def _fetch_new(client, notebook_id: str) -> list[dict]:
+    """Turnos que no están en el espejo, en el orden en que los devuelve NotebookLM."""
+    get_history = client.chat.get_history
+    limit = HISTORY_PAGE if _accepts_limit(get_history) is not False else None
+    while True:
+        if limit is None:
+            turns = await get_history(notebook_id)
+        else:
+            try:
+                turns = await get_history(notebook_id, limit=limit)
+            except TypeError:
+                limit = None
+                continue
+
+        items = [_turn_to_dict(t) for t in turns]
+        keys = [_turn_key(item) for item in items]
+        seen = _known_keys(notebook_id, keys)
+        # Con algún turno conocido en la página se enlaza con lo ya sincronizado;
+        # sin ninguno, o es el historial entero o hay que pedir más atrás
+        if seen or limit is None or len(items) < limit:
+            new = []
+            for item, key in zip(items, keys):
+                if key not in seen:
+                    seen.add(key)
+                    new.append(item)
+            return new
+        limit *= 4
+
+
+def store(notebook_id: str, items: list[dict]) -> int:
+    """Añade turnos al espejo (ignora los ya presentes). Devuelve cuántos eran nuevos."""
+    conn = nlm_store.connect()
+    now = time.time()
+    added = 0
+    with conn:
+        for item in items:
+            data = {k: item[k] for k in ("question", "answer", "is_follow_up")}
+            added += conn.execute(
+                "INSERT OR IGNORE INTO history (notebook_id, key, conversation_id, turn, data, synced_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (notebook_id, _turn_key(item), item["conversation_id"], item["turn"],
+                 zlib.compress(json.dumps(data, ensure_ascii=False).encode()), now),
+            ).rowcount
+    return added
+
+
+async def sync(client, notebook_id: str) -> int:
+    """Sincroniza el espejo con NotebookLM. Devuelve el número de turnos nuevos."""
+    items = await _fetch_new(client, notebook_id)
+    return store(notebook_id, items)
+
+
+def _decode(row) -> dict:
+    _, conversation_id, turn, data, synced_at = row
+    item = json.loads(zlib.decompress(data))
+    item.update(conversation_id=conversation_id, turn=turn, synced_at=synced_at)
+    return item
+
+
+def iter_history(notebook_id: str, search: str = None, page_size: int = READ_PAGE):
+    """
+    Turnos del espejo, del más antiguo al más reciente, leídos de `page_size`
+    en `page_size`. `search` filtra por texto en pregunta o respuesta.
+    """
+    conn = nlm_store.connect()
+    needle = search.casefold() if search else None
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, conversation_id, turn, data, synced_at FROM history "
+            "WHERE notebook_id = ? AND id > ? ORDER BY id LIMIT ?",
+            (notebook_id, last_id, page_size),
+        ).fetchall()
+        if not rows:
+            return
+        for row in rows:
+            item = _decode(row)
+            if needle and needle not in f"{item['question']}\n{item['answer']}".casefold():
+                continue
+            yield item
+        last_id = rows[-1][0]
+
+
+def tail(notebook_id: str, limit: int) -> list[dict]:
+    """Últimos `limit` turnos del espejo."""
+    rows = nlm_store.connect().execute(
+        "SELECT id, conversation_id, turn, data, synced_at FROM history "
+        "WHERE notebook_id = ? ORDER BY id DESC LIMIT ?",
+        (notebook_id, limit),
+    ).fetchall()
+    return [_decode(row) for row in reversed(rows)]
+
+
+def count(notebook_id: str) -> int:
+    return nlm_store.connect().execute(
+        "SELECT COUNT(*) FROM history WHERE notebook_id = ?", (notebook_id,)
+    ).fetchone()[0]
+
+
+def forget(notebook_id: str):
+    conn = nlm_store.connect()
+    with conn:
+        conn.execute("DELETE FROM history WHERE notebook_id = ?", (notebook_id,))
@@ -0,0 +1,71 @@
+"""
+Manifiesto de fuentes por notebook (tabla `source_manifest` de nlm_store).
+
+Cada fuente añadida queda registrada por su clave de contenido (ver
+nlm_sources.content_key: sha256 del archivo, URL normalizada, id de vídeo
+de YouTube, id de Drive o sha256 del texto) junto al source_id creado. Volver
+a añadir el mismo contenido no sube nada: se informa como "unchanged".
+reconcile() lo contrasta con sources.list para detectar desajustes.
+"""
+
+import time
+
+import nlm_store
+
+
+def lookup(notebook_id: str, content_key: str) -> str | None:
+    """source_id ya creado para ese contenido, o None."""
+    row = nlm_store.connect().execute(
+        "SELECT source_id FROM source_manifest WHERE notebook_id = ? AND content_key = ?",
+        (notebook_id, content_key),
+    ).fetchone()
+    return row[0] if row else None
+
+
+def record(notebook_id: str, content_key: str, source_id: str, source: str, source_type: str):
+    """Registra la fuente creada para un contenido."""
+    conn = nlm_store.connect()
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO source_manifest "
+            "(notebook_id, content_key, source_id, source, type, added_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (notebook_id, content_key, source_id, source[:500], source_type, time.time()),
+        )
+
+
+def entries(notebook_id: str) -> list[dict]:
+    rows = nlm_store.connect().execute(
+        "SELECT content_key, source_id, source, type, added_at FROM source_manifest "
+        "WHERE notebook_id = ? ORDER BY added_at", (notebook_id,),
+    ).fetchall()
+    keys = ("content_key", "source_id", "source", "type", "added_at")
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def reconcile(notebook_id: str, sources, apply: bool = True) -> dict:
+    """
+    Compara el manifiesto con las fuentes reales (resultado de sources.list):
+    missing = entradas cuya fuente ya no existe (se borran si apply),
+    untracked = fuentes del notebook que el manifiesto no conoce.
+    """
+    remote = {src.id: src for src in sources}
+    local = entries(notebook_id)
+    known = {entry["source_id"] for entry in local}
+    missing = [entry for entry in local if entry["source_id"] not in remote]
+    untracked = [src for sid, src in remote.items() if sid not in known]
+    if apply and missing:
+        forget(notebook_id, [entry["source_id"] for entry in missing])
+    return {"tracked": len(local) - len(missing), "missing": missing, "untracked": untracked}
+
+
+def forget(notebook_id: str, source_ids: list[str] = None):
+    """Olvida fuentes concretas (tras borrarlas) o todo el notebook."""
+    conn = nlm_store.connect()
+    with conn:
+        if source_ids is None:
+            conn.execute("DELETE FROM source_manifest WHERE notebook_id = ?", (notebook_id,))
+        else:
+            conn.executemany(
+                "DELETE FROM source_manifest WHERE notebook_id = ? AND source_id = ?",
+                [(notebook_id, sid) for sid in source_ids],
+            )
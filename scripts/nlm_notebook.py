@@ -7,12 +7,10 @@ import argparse
 import json
 import sys
 from datetime import datetime
-from pathlib import Path
 
-from nlm_client import _create_client, run_async
+from nlm_client import DATA_DIR, _create_client, run_async
 
-SKILL_DIR = Path(__file__).parent.parent
-LIBRARY_FILE = SKILL_DIR / "data" / "library.json"
+LIBRARY_FILE = DATA_DIR / "library.json"
 
 
 def _load_library() -> dict:
@@ -25,6 +23,7 @@ def _load_library() -> dict:
 def _save_library(data: dict):
     """Guarda library.json."""
     data["last_sync"] = datetime.now().isoformat()
+    LIBRARY_FILE.parent.mkdir(parents=True, exist_ok=True)
     LIBRARY_FILE.write_text(json.dumps(data, indent=2, ensure_ascii=False))
 
 
@@ -105,6 +104,16 @@ def cmd_delete(notebook_id: str):
                 if library.get("active_notebook_id") == full_id:
                     library["active_notebook_id"] = None
                 _save_library(library)
+                import nlm_cache
+                import nlm_citations
+                import nlm_conversations
+                import nlm_history
+                import nlm_manifest
+                nlm_cache.clear(full_id)
+                nlm_conversations.forget(full_id)
+                nlm_history.forget(full_id)
+                nlm_citations.forget(full_id)
+                nlm_manifest.forget(full_id)
                 print(f"ELIMINADO: {full_id}")
             else:
                 print(f"ERROR al eliminar: {full_id}")
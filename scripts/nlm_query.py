@@ -4,93 +4,645 @@ Consultas a notebooks con citas. Reemplaza ask_question.py (legacy).
 """
 
 import argparse
+import asyncio
 import json
 import sys
-
-from nlm_client import _create_client, run_async
-
-
-def cmd_ask(notebook_id: str, question: str, source_ids: list[str] = None, follow_up: str = None):
-    """Hace una pregunta a un notebook."""
+import time
+from contextlib import AsyncExitStack
+
+import nlm_cache
+import nlm_citations
+import nlm_conversations
+import nlm_history
+import nlm_similar
+import nlm_store
+from nlm_client import DATA_DIR, _create_client, backend_module, borrow_client, run_async
+
+
+def _response_to_dict(result) -> dict:
+    """ChatResponse → dict serializable (para NDJSON)."""
+    return {
+        "answer": result.answer,
+        "references": [
+            {
+                "source_id": ref.source_id,
+                "citation_number": ref.citation_number,
+                "cited_text": ref.cited_text,
+            }
+            for ref in (result.references or [])
+        ],
+        "conversation_id": result.conversation_id,
+        "turn": result.turn_number,
+    }
+
+
+def _print_answer(data: dict):
+    """Imprime una respuesta (dict de _response_to_dict) en el formato de `ask`."""
+    print("RESPUESTA:")
+    print(data["answer"])
+    _print_citations(data)
+
+
+def _print_citations(data: dict):
+    """Bloque de citas y metadata que sigue a la respuesta."""
+    # Citas
+    if data["references"]:
+        print(f"\nCITAS ({len(data['references'])}):")
+        for ref in data["references"]:
+            num = f"[{ref['citation_number']}]" if ref["citation_number"] else ""
+            text = ref["cited_text"][:150] if ref["cited_text"] else "(sin texto)"
+            print(f"  {num} Fuente {ref['source_id'][:8]}...: {text}")
+
+    # Metadata para follow-ups
+    print(f"\n---")
+    print(f"conversation_id: {data['conversation_id']}")
+    print(f"turn: {data['turn']}")
+    if data.get("cached"):
+        print(f"cached: {time.strftime('%Y-%m-%d %H:%M', time.localtime(data['cached_at']))}")
+    if data.get("similarity"):
+        print(f"similar: {data['similarity']:.2f} a «{data['cached_question']}»")
+
+
+def _cache_key(notebook_id: str, question: str, source_ids: list[str], cache_mode: str) -> str | None:
+    """Clave de caché, o None si la caché está desactivada (--no-cache)."""
+    if cache_mode == "off":
+        return None
+    return nlm_cache.cache_key(notebook_id, question, source_ids)
+
+
+def _cache_lookup(key: str | None, fingerprint: str, cache_mode: str, notebook_id: str, question: str,
+                  source_ids: list[str] = None, similarity: float = 0) -> dict | None:
+    """
+    Respuesta cacheada si procede (--refresh la ignora pero guarda la nueva):
+    la de la pregunta exacta o, con similarity > 0, la de una casi igual.
+    """
+    if key is None or cache_mode != "use":
+        return None
+    data = nlm_cache.lookup(key, fingerprint)
+    if data is None and similarity > 0:
+        data = nlm_cache.lookup_similar(notebook_id, question, source_ids, fingerprint, similarity)
+    if data:
+        data["cached"] = True
+    return data
+
+
+def _remember(key: str | None, notebook_id: str, question: str, data: dict, fingerprint: str,
+              source_ids: list[str] = None):
+    """Guarda una respuesta nueva en la caché (si está activa) y sus citas en el índice."""
+    if key:
+        nlm_cache.store(key, notebook_id, question, data, fingerprint, source_ids)
+    nlm_citations.index_answer(notebook_id, question, data)
+
+
+def _lazy_client(stack: AsyncExitStack):
+    """Devuelve get_client(): abre el cliente la primera vez que se pide y lo reutiliza."""
+    client = None
+
+    async def get_client():
+        nonlocal client
+        if client is None:
+            client = await stack.enter_async_context(borrow_client())
+        return client
+
+    return get_client
+
+
+async def _fingerprint(get_client, notebook_id: str) -> str:
+    """Huella de fuentes del notebook: la guardada si es reciente, si no una llamada a sources.list."""
+    fingerprint = nlm_cache.stored_fingerprint(notebook_id)
+    if fingerprint is None:
+        fingerprint = await nlm_cache.refresh_fingerprint(await get_client(), notebook_id)
+    return fingerprint
+
+
+# === Configuración de chat y personas ===
+
+# Presets de configure: {goal, length, prompt}. Se amplían con data/personas.json
+PERSONAS = {
+    "default": {},
+    "tutor": {"goal": "learning"},
+    "breve": {"length": "shorter"},
+    "detallado": {"length": "longer"},
+}
+PERSONAS_FILE = DATA_DIR / "personas.json"
+
+
+def _chat_config(goal: str = None, length: str = None, prompt: str = None) -> dict:
+    """Configuración normalizada: sin valores vacíos ni "default" ({} = la de por defecto)."""
+    config = {"goal": goal, "length": length, "prompt": prompt}
+    return {k: v for k, v in config.items() if v and v != "default"}
+
+
+def _load_personas() -> dict:
+    personas = dict(PERSONAS)
+    if PERSONAS_FILE.exists():
+        personas.update(json.loads(PERSONAS_FILE.read_text()))
+    return personas
+
+
+def _persona_config(name: str) -> dict:
+    """Configuración de un preset; sale con error si no existe."""
+    personas = _load_personas()
+    if name not in personas:
+        print(f"ERROR: Persona desconocida: {name} (disponibles: {', '.join(sorted(personas))})")
+        sys.exit(1)
+    return _chat_config(**personas[name])
+
+
+async def _apply_chat_config(client, notebook_id: str, config: dict, force: bool = False) -> bool:
+    """
+    Aplica la configuración con chat.configure salvo que sea la última aplicada
+    (nlm_store). Devuelve True si hubo llamada.
+    """
+    if not force and nlm_store.get_chat_config(notebook_id) == config:
+        nlm_store.bump("chat_config.skipped")
+        return False
+
+    backend = backend_module()
+    ChatGoal, ChatResponseLength = backend.ChatGoal, backend.ChatResponseLength
+
+    goal_map = {
+        "default": ChatGoal.DEFAULT,
+        "learning": ChatGoal.LEARNING_GUIDE,
+        "custom": ChatGoal.CUSTOM,
+    }
+    length_map = {
+        "default": ChatResponseLength.DEFAULT,
+        "longer": ChatResponseLength.LONGER,
+        "shorter": ChatResponseLength.SHORTER,
+    }
+    # Estado completo (no solo lo que cambia) para que coincida con lo registrado
+    kwargs = {
+        "goal": goal_map.get(config.get("goal"), ChatGoal.DEFAULT),
+        "response_length": length_map.get(config.get("length"), ChatResponseLength.DEFAULT),
+    }
+    if config.get("prompt"):
+        kwargs["custom_prompt"] = config["prompt"]
+
+    await client.chat.configure(notebook_id, **kwargs)
+    # La configuración forma parte de la clave de la caché de respuestas
+    nlm_store.set_chat_config(notebook_id, config)
+    nlm_store.bump("chat_config.applied")
+    return True
+
+
+async def _use_persona(get_client, notebook_id: str, persona: str | None):
+    """Aplica un preset antes de preguntar, solo si difiere de la configuración registrada."""
+    if persona is None:
+        return
+    config = _persona_config(persona)
+    if nlm_store.get_chat_config(notebook_id) != config:
+        await _apply_chat_config(await get_client(), notebook_id, config)
+
+
+async def _stream_answer(client, notebook_id: str, question: str, kwargs: dict):
+    """
+    Fragmentos de texto (str) según llegan y, al final, el dict de la respuesta.
+    Usa chat.ask_stream si el cliente lo ofrece; si no (o a través del daemon),
+    la respuesta completa llega como un único fragmento.
+    """
+    ask_stream = getattr(client.chat, "ask_stream", None)
+    if ask_stream is None:
+        result = await client.chat.ask(notebook_id, question, **kwargs)
+        yield result.answer
+        yield _response_to_dict(result)
+        return
+
+    chunks, final = [], None
+    async for item in ask_stream(notebook_id, question, **kwargs):
+        if isinstance(item, str):
+            chunks.append(item)
+            yield item
+        else:
+            final = item
+    if final is not None:
+        yield _response_to_dict(final)
+    else:
+        yield {"answer": "".join(chunks), "references": [], "conversation_id": None, "turn": None}
+
+
+def _emit(event: str, started: float, **fields):
+    """Una línea NDJSON de `ask --ndjson`."""
+    record = {"event": event, "elapsed": round(time.monotonic() - started, 3), **fields}
+    print(json.dumps(record, ensure_ascii=False), flush=True)
+
+
+def cmd_ask(notebook_id: str, question: str, source_ids: list[str] = None, follow_up: str = None,
+            cache_mode: str = "use", stream: bool = False, ndjson: bool = False,
+            thread: str = nlm_conversations.DEFAULT_THREAD,
+            similarity: float = nlm_similar.SIMILARITY_THRESHOLD, persona: str = None):
+    """
+    Hace una pregunta a un notebook. cache_mode: use | refresh | off
+    stream: imprime la respuesta según llega; ndjson: eventos chunk/done en NDJSON (implica stream).
+    El turno queda registrado como conversación en curso de `thread` (ver nlm_conversations).
+    similarity: reutiliza la respuesta a una pregunta casi igual desde ese umbral (0 = solo exactas).
+    persona: preset de configure a aplicar antes (solo si no es ya el activo).
+    """
+    stream = stream or ndjson
 
     async def _ask():
-        async with await _create_client() as client:
-            kwargs = {"source_ids": source_ids} if source_ids else {}
-            if follow_up:
-                kwargs["conversation_id"] = follow_up
-
-            result = await client.chat.ask(notebook_id, question, **kwargs)
-
-            # Respuesta principal
-            print("RESPUESTA:")
-            print(result.answer)
-
-            # Citas
-            if result.references:
-                print(f"\nCITAS ({len(result.references)}):")
-                for ref in result.references:
-                    num = f"[{ref.citation_number}]" if ref.citation_number else ""
-                    text = ref.cited_text[:150] if ref.cited_text else "(sin texto)"
-                    print(f"  {num} Fuente {ref.source_id[:8]}...: {text}")
-
-            # Metadata para follow-ups
-            print(f"\n---")
-            print(f"conversation_id: {result.conversation_id}")
-            print(f"turn: {result.turn_number}")
-
-            return 0
+        started = time.monotonic()
+        first_chunk = None
+
+        async with AsyncExitStack() as stack:
+            get_client = _lazy_client(stack)
+            await _use_persona(get_client, notebook_id, persona)
+            # Un follow-up depende de la conversación: nunca se cachea
+            key = _cache_key(notebook_id, question, source_ids, "off" if follow_up else cache_mode)
+            data = fingerprint = None
+            if key:
+                fingerprint = await _fingerprint(get_client, notebook_id)
+                data = _cache_lookup(key, fingerprint, cache_mode, notebook_id, question, source_ids, similarity)
+
+            if data is None:
+                kwargs = {"source_ids": source_ids} if source_ids else {}
+                if follow_up:
+                    kwargs["conversation_id"] = follow_up
+
+                client = await get_client()
+                if stream:
+                    if not ndjson:
+                        print("RESPUESTA:", flush=True)
+                    async for item in _stream_answer(client, notebook_id, question, kwargs):
+                        if isinstance(item, dict):
+                            data = item
+                            continue
+                        if first_chunk is None:
+                            first_chunk = time.monotonic() - started
+                        if ndjson:
+                            _emit("chunk", started, text=item)
+                        else:
+                            print(item, end="", flush=True)
+                else:
+                    result = await client.chat.ask(notebook_id, question, **kwargs)
+                    data = _response_to_dict(result)
+                _remember(key, notebook_id, question, data, fingerprint, source_ids)
+                nlm_conversations.record_turn(notebook_id, question, data, thread)
+
+        if first_chunk is None:
+            # Sin streaming, o respuesta desde la caché
+            if ndjson:
+                _emit("chunk", started, text=data["answer"])
+                first_chunk = time.monotonic() - started
+            else:
+                _print_answer(data)
+                return 0
+
+        if ndjson:
+            _emit("done", started, ttfb=round(first_chunk, 3), **data)
+        else:
+            print()
+            _print_citations(data)
+        return 0
 
     return run_async(_ask())
 
 
-def cmd_history(notebook_id: str):
-    """Muestra el historial de conversaciones de un notebook."""
-
-    async def _history():
-        async with await _create_client() as client:
-            history = await client.chat.get_history(notebook_id)
-            print(f"HISTORIAL ({len(history)} turnos):")
-            for turn in history:
-                role = "Tú" if not getattr(turn, "is_follow_up", False) else "Follow-up"
-                print(f"  [{role}] {str(turn)[:100]}")
-            return 0
-
-    return run_async(_history())
-
-
-def cmd_configure(notebook_id: str, goal: str = None, length: str = None, prompt: str = None):
-    """Configura la persona del chat."""
+async def _cached_ask(get_client, notebook_id: str, question: str, cache_mode: str,
+                      similarity: float = 0) -> dict:
+    """chat.ask de un notebook pasando por la caché (huella de fuentes incluida)."""
+    key = _cache_key(notebook_id, question, None, cache_mode)
+    fingerprint = None
+    if key:
+        fingerprint = await _fingerprint(get_client, notebook_id)
+        data = _cache_lookup(key, fingerprint, cache_mode, notebook_id, question, similarity=similarity)
+        if data:
+            return data
+    client = await get_client()
+    data = _response_to_dict(await client.chat.ask(notebook_id, question))
+    _remember(key, notebook_id, question, data, fingerprint)
+    return data
+
+
+def _select_notebooks(all_notebooks: bool, tags: list[str] = None, ids: list[str] = None) -> dict:
+    """Notebooks de library.json para un fan-out: {id: nombre}."""
+    from nlm_notebook import _load_library, _resolve_id
+
+    notebooks = _load_library()["notebooks"]
+    if ids:
+        selected = [_resolve_id(i) for i in ids]
+    elif tags:
+        wanted = {t.lower() for t in tags}
+        selected = [nid for nid, nb in notebooks.items()
+                    if wanted & {t.lower() for t in nb.get("tags", [])}]
+    else:
+        selected = list(notebooks)
+    return {nid: notebooks.get(nid, {}).get("name") or nid[:8] for nid in dict.fromkeys(selected)}
+
+
+def cmd_ask_many(notebooks: dict, question: str, deadline: float = 120, concurrency: int = 8,
+                 cache_mode: str = "use", ndjson: bool = False,
+                 similarity: float = nlm_similar.SIMILARITY_THRESHOLD):
+    """
+    Hace la misma pregunta a varios notebooks a la vez con un cliente compartido.
+    Lo que no termina antes de `deadline` segundos se cancela y se informa como pendiente.
+    """
+
+    async def _fan_out():
+        started = time.monotonic()
+        results = {}
+
+        async with AsyncExitStack() as stack:
+            get_client = _lazy_client(stack)
+            # Abrir el cliente antes de lanzar las tareas para que lo compartan
+            await get_client()
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def _one(notebook_id: str) -> dict:
+                record = {"notebook_id": notebook_id, "name": notebooks[notebook_id]}
+                async with semaphore:
+                    try:
+                        record.update(await _cached_ask(get_client, notebook_id, question, cache_mode,
+                                                         similarity))
+                    except Exception as e:
+                        record["error"] = f"{type(e).__name__}: {e}"
+                record["elapsed"] = round(time.monotonic() - started, 3)
+                return record
+
+            tasks = {asyncio.create_task(_one(nid)): nid for nid in notebooks}
+            try:
+                for next_done in asyncio.as_completed(tasks, timeout=deadline):
+                    record = await next_done
+                    results[record["notebook_id"]] = record
+                    if ndjson:
+                        print(json.dumps(record, ensure_ascii=False), flush=True)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+        pending = [nid for nid in notebooks if nid not in results]
+        if ndjson:
+            for nid in pending:
+                print(json.dumps({"notebook_id": nid, "name": notebooks[nid], "timeout": True},
+                                 ensure_ascii=False), flush=True)
+
+        answered = sum("error" not in r for r in results.values())
+        errors = len(results) - answered
+        summary = (f"{answered}/{len(notebooks)} notebooks respondieron en "
+                   f"{time.monotonic() - started:.1f}s ({errors} errores, {len(pending)} sin respuesta a tiempo)")
+        if ndjson:
+            print(f"FAN-OUT: {summary}", file=sys.stderr)
+        else:
+            print(f"RESULTADOS: {summary}")
+            for nid, name in notebooks.items():
+                record = results.get(nid)
+                print(f"\n=== {name} [{nid[:8]}...] ===")
+                if record is None:
+                    print(f"(sin respuesta antes del deadline de {deadline:.0f}s)")
+                elif "error" in record:
+                    print(f"ERROR: {record['error']}")
+                else:
+                    print(record["answer"])
+                    _print_citations(record)
+        return 0 if answered else 1
+
+    return run_async(_fan_out())
+
+
+def _read_questions(path: str) -> list[dict]:
+    """Lee preguntas de un archivo o de stdin ('-'): una por línea, o JSONL con question/source_ids."""
+    handle = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    items = []
+    try:
+        for line in handle:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                obj = json.loads(line)
+                items.append({"question": obj["question"], "source_ids": obj.get("source_ids")})
+            else:
+                items.append({"question": line, "source_ids": None})
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+    return items
+
+
+def cmd_ask_batch(notebook_id: str, questions: list[dict], source_ids: list[str] = None,
+                  concurrency: int = 4, order: str = "input", cache_mode: str = "use",
+                  similarity: float = nlm_similar.SIMILARITY_THRESHOLD, persona: str = None):
+    """Hace muchas preguntas en paralelo sobre un cliente y emite NDJSON (una línea por pregunta)."""
+
+    async def _batch():
+        async with AsyncExitStack() as stack:
+            get_client = _lazy_client(stack)
+            await _use_persona(get_client, notebook_id, persona)
+
+            # Primero la caché: si todo está cacheado no hace falta abrir cliente
+            fingerprint = None
+            if cache_mode != "off":
+                fingerprint = await _fingerprint(get_client, notebook_id)
+            for item in questions:
+                ids = item["source_ids"] or source_ids
+                item["key"] = _cache_key(notebook_id, item["question"], ids, cache_mode)
+                item["cached"] = _cache_lookup(item["key"], fingerprint, cache_mode, notebook_id,
+                                               item["question"], ids, similarity)
+            misses = sum(item["cached"] is None for item in questions)
+
+            client = await get_client() if misses else None
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def _one(index: int, item: dict) -> dict:
+                record = {"index": index, "question": item["question"]}
+                if item["cached"]:
+                    record.update(item["cached"])
+                    record["elapsed"] = 0.0
+                    return record
+
+                ids = item["source_ids"] or source_ids
+                kwargs = {"source_ids": ids} if ids else {}
+                async with semaphore:
+                    started = time.monotonic()
+                    try:
+                        result = await client.chat.ask(notebook_id, item["question"], **kwargs)
+                        data = _response_to_dict(result)
+                        record.update(data)
+                        _remember(item["key"], notebook_id, item["question"], data, fingerprint, ids)
+                    except Exception as e:
+                        record["error"] = f"{type(e).__name__}: {e}"
+                    record["elapsed"] = round(time.monotonic() - started, 3)
+                return record
+
+            tasks = [asyncio.create_task(_one(i, item)) for i, item in enumerate(questions)]
+            # input: en el orden de entrada (cada línea sale en cuanto están listas las anteriores)
+            # completion: según van terminando
+            pending = tasks if order == "input" else asyncio.as_completed(tasks)
+            errors = 0
+            for task in pending:
+                record = await task
+                errors += "error" in record
+                print(json.dumps(record, ensure_ascii=False), flush=True)
+
+            print(f"BATCH: {len(tasks) - errors} OK ({len(tasks) - misses} desde caché), {errors} errores",
+                  file=sys.stderr)
+            return 0 if errors == 0 else 1
+
+    return run_async(_batch())
+
+
+def _print_turns(turns, full: bool = False) -> int:
+    """Imprime turnos del espejo de historial. Devuelve cuántos imprimió."""
+    shown = 0
+    for turn in turns:
+        role = "Follow-up" if turn["is_follow_up"] else "Tú"
+        question, answer = turn["question"], turn["answer"]
+        if not full:
+            question, answer = question[:100], answer[:100]
+        print(f"  [{role}] {question}")
+        print(f"      → {answer}")
+        shown += 1
+    return shown
+
+
+def cmd_history(notebook_id: str, limit: int = 20, thread: str = None, remote: bool = False,
+                full: bool = False, search: str = None, export: str = None, offline: bool = False):
+    """
+    Muestra el historial de conversaciones de un notebook. Por defecto sirve
+    los turnos registrados localmente por `ask`. remote, search y export usan
+    el espejo del historial de NotebookLM (nlm_history), que antes se
+    sincroniza de forma incremental salvo con offline=True.
+    """
+    if not (remote or search or export):
+        turns = nlm_conversations.recent_turns(notebook_id, limit, thread)
+        if not turns:
+            return cmd_history(notebook_id, limit, remote=True, full=full, offline=offline)
+        print(f"HISTORIAL LOCAL ({len(turns)} turnos más recientes; --remote para consultar NotebookLM):")
+        for turn in turns:
+            label = f"{turn['thread']} | " if turn["thread"] else ""
+            question, answer = turn["question"], turn["answer"]
+            if not full:
+                question, answer = question[:100], answer[:100]
+            print(f"  [{label}{turn['conversation_id'][:8]} #{turn['turn']}] {question}")
+            print(f"      → {answer}")
+        active = nlm_conversations.threads(notebook_id)
+        if active:
+            print(f"\nHILOS ({len(active)}):")
+            for t in active:
+                print(f"  {t['thread'] or '(por defecto)'}: {t['conversation_id']} ({t['turns']} turnos)")
+        return 0
+
+    async def _sync():
+        async with borrow_client() as client:
+            return await nlm_history.sync(client, notebook_id)
+
+    if not offline:
+        added = run_async(_sync())
+        # A stderr: con --export - la salida estándar es solo JSONL
+        print(f"SINCRONIZADO: {added} turnos nuevos ({nlm_history.count(notebook_id)} en el espejo)",
+              file=sys.stderr)
+
+    if export:
+        handle = sys.stdout if export == "-" else open(export, "w", encoding="utf-8")
+        exported = 0
+        try:
+            for turn in nlm_history.iter_history(notebook_id, search):
+                handle.write(json.dumps(turn, ensure_ascii=False) + "\n")
+                exported += 1
+        finally:
+            if handle is not sys.stdout:
+                handle.close()
+        print(f"EXPORTADOS: {exported} turnos → {export}", file=sys.stderr)
+    elif search:
+        print(f"HISTORIAL: turnos que contienen «{search}»:")
+        found = _print_turns(nlm_history.iter_history(notebook_id, search), full)
+        print(f"\n{found} coincidencias")
+    else:
+        turns = nlm_history.tail(notebook_id, limit)
+        print(f"HISTORIAL ({len(turns)} de {nlm_history.count(notebook_id)} turnos):")
+        _print_turns(turns, full)
+    return 0
+
+
+def cmd_citations(search: str = None, source_id: str = None, notebook_id: str = None, limit: int = 20):
+    """Consulta el índice local de citas: por texto citado, por fuente o estadísticas."""
+    if search:
+        hits = nlm_citations.search(search, notebook_id, limit)
+        print(f"CITAS con «{search}» ({len(hits)}):")
+        for hit in hits:
+            num = f"[{hit['citation_number']}]" if hit["citation_number"] else ""
+            print(f"  {num} Fuente {hit['source_id'][:8]}... (notebook {hit['notebook_id'][:8]}...)")
+            print(f"      «{hit['cited_text'][:150]}»")
+            print(f"      P: {hit['question'][:100]}  [{hit['answer_id']}]")
+        return 0
+
+    if source_id:
+        answers = nlm_citations.answers_citing(source_id, notebook_id, limit)
+        print(f"RESPUESTAS que citan {source_id[:8]}... ({len(answers)}):")
+        for a in answers:
+            when = time.strftime("%Y-%m-%d %H:%M", time.localtime(a["created_at"]))
+            print(f"  [{when}] {a['question'][:100]} ({a['citations']} citas)  [{a['answer_id']}]")
+            print(f"      → {a['answer'][:150]}")
+        return 0
+
+    stats = nlm_citations.stats()
+    engine = "FTS5" if stats["fts"] else "LIKE (SQLite sin FTS5)"
+    print(f"ÍNDICE DE CITAS: {stats['citations']} citas de {stats['answers']} respuestas, "
+          f"{stats['sources']} fuentes (búsqueda: {engine})")
+    return 0
+
+
+def cmd_configure(notebook_id: str, goal: str = None, length: str = None, prompt: str = None,
+                  persona: str = None, force: bool = False):
+    """
+    Configura la persona del chat (sin llamada si ya es la aplicada, salvo force).
+    Las opciones no indicadas conservan su valor registrado; un preset la sustituye entera.
+    """
+    if persona:
+        config = _persona_config(persona)
+    else:
+        given = {"goal": goal, "length": length, "prompt": prompt}
+        merged = {**nlm_store.get_chat_config(notebook_id), **{k: v for k, v in given.items() if v is not None}}
+        config = _chat_config(**merged)
+    if not force and nlm_store.get_chat_config(notebook_id) == config:
+        nlm_store.bump("chat_config.skipped")
+        print(f"SIN CAMBIOS: {json.dumps(config, ensure_ascii=False)}")
+        return 0
 
     async def _configure():
-        from notebooklm import ChatGoal, ChatResponseLength
-
-        goal_map = {
-            "default": ChatGoal.DEFAULT,
-            "learning": ChatGoal.LEARNING_GUIDE,
-            "custom": ChatGoal.CUSTOM,
-        }
-        length_map = {
-            "default": ChatResponseLength.DEFAULT,
-            "longer": ChatResponseLength.LONGER,
-            "shorter": ChatResponseLength.SHORTER,
-        }
-
         async with await _create_client() as client:
-            kwargs = {}
-            if goal:
-                kwargs["goal"] = goal_map.get(goal, ChatGoal.DEFAULT)
-            if length:
-                kwargs["response_length"] = length_map.get(length, ChatResponseLength.DEFAULT)
-            if prompt:
-                kwargs["custom_prompt"] = prompt
-
-            result = await client.chat.configure(notebook_id, **kwargs)
-            print(f"CONFIGURADO: {result}")
+            await _apply_chat_config(client, notebook_id, config, force=True)
+            print(f"CONFIGURADO: {json.dumps(config, ensure_ascii=False)}")
             return 0
 
     return run_async(_configure())
 
 
+def cmd_cache(action: str, notebook_id: str = None):
+    """Estadísticas o limpieza de la caché de respuestas."""
+    if action == "clear":
+        deleted = nlm_cache.clear(notebook_id)
+        print(f"CACHÉ LIMPIADA: {deleted} respuestas")
+        return 0
+
+    stats = nlm_cache.stats()
+    lookups = stats["hits"] + stats["misses"]
+    ratio = f"{stats['hits'] / lookups:.0%}" if lookups else "-"
+    print(f"CACHÉ: {stats['entries']} respuestas de {stats['notebooks']} notebooks ({nlm_store.DB_FILE})")
+    print(f"  Aciertos: {stats['hits']} / fallos: {stats['misses']} (tasa {ratio}); "
+          f"{stats['similar_hits']} fallos resueltos con una pregunta similar")
+    print(f"  Guardadas: {stats['stores']}, caducadas: {stats['expired']}, descartadas (LRU): {stats['evicted']}")
+    print(f"  Invalidadas por cambio de fuentes: {stats['stale']} "
+          f"(huella comprobada {stats['fingerprint_checks']} veces, cada {nlm_cache.FINGERPRINT_TTL:.0f}s como mucho)")
+    print(f"  TTL: {stats['ttl']:.0f}s, máximo: {stats['max_entries']} respuestas")
+    return 0
+
+
+def _add_cache_flags(parser):
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--no-cache", dest="cache_mode", action="store_const", const="off",
+                       help="No leer ni guardar en la caché de respuestas")
+    group.add_argument("--refresh", dest="cache_mode", action="store_const", const="refresh",
+                       help="Preguntar de nuevo aunque haya respuesta cacheada (y actualizarla)")
+    parser.set_defaults(cache_mode="use")
+    parser.add_argument("--similarity", type=float, default=nlm_similar.SIMILARITY_THRESHOLD,
+                        help="Reutilizar la respuesta a una pregunta casi igual con esta similitud mínima "
+                             f"(0-1, p. ej. 0.9; 0 = solo exactas; default: {nlm_similar.SIMILARITY_THRESHOLD})")
+
+
 def main():
     parser = argparse.ArgumentParser(description="Consultas a NotebookLM")
     sub = parser.add_subparsers(dest="command", required=True)
@@ -98,25 +650,83 @@ def main():
     p_ask = sub.add_parser("ask", help="Hacer una pregunta")
     p_ask.add_argument("--notebook-id", "--id", help="ID del notebook (o activo)")
     p_ask.add_argument("--notebook-url", help="URL del notebook")
+    p_ask.add_argument("--all", action="store_true", help="Preguntar a todos los notebooks de la biblioteca")
+    p_ask.add_argument("--tag", action="append", help="Preguntar a los notebooks con este tag (repetible)")
+    p_ask.add_argument("--ids", nargs="+", help="Preguntar a estos notebooks (IDs o prefijos)")
+    p_ask.add_argument("--deadline", type=float, default=120,
+                       help="Con --all/--tag/--ids: segundos máximos en total (default: 120)")
     p_ask.add_argument("--question", "-q", required=True, help="Pregunta")
     p_ask.add_argument("--source-ids", nargs="+", help="IDs de fuentes específicas")
     p_ask.add_argument("--follow-up", help="conversation_id para follow-up")
+    p_ask.add_argument("--continue", dest="continue_", action="store_true",
+                       help="Seguir la última conversación de este notebook")
+    p_ask.add_argument("--thread", help="Seguir (o empezar) el hilo con este nombre")
+    p_ask.add_argument("--stream", action="store_true",
+                       help="Imprimir la respuesta según llega. notebooklm-py aún no transmite por "
+                            "fragmentos (ni el daemon): con él llega entera, en un solo bloque")
+    p_ask.add_argument("--ndjson", action="store_true",
+                       help="Eventos NDJSON (chunk por fragmento, done con respuesta y citas); implica --stream")
+    p_ask.add_argument("--persona", help="Preset de configure a aplicar si no es el activo")
+    _add_cache_flags(p_ask)
+
+    p_batch = sub.add_parser("ask-batch", help="Hacer muchas preguntas en paralelo (salida NDJSON)")
+    p_batch.add_argument("--notebook-id", "--id", help="ID del notebook (o activo)")
+    p_batch.add_argument("--file", "-f", default="-",
+                         help="Archivo de preguntas: una por línea o JSONL {question, source_ids} (default: stdin)")
+    p_batch.add_argument("--source-ids", nargs="+", help="IDs de fuentes por defecto")
+    p_batch.add_argument("--concurrency", "-c", type=int, default=4, help="Preguntas simultáneas (default: 4)")
+    p_batch.add_argument("--order", choices=["input", "completion"], default="input",
+                         help="Orden de salida (default: input)")
+    p_batch.add_argument("--persona", help="Preset de configure a aplicar si no es el activo")
+    _add_cache_flags(p_batch)
 
     p_history = sub.add_parser("history", help="Ver historial de chat")
     p_history.add_argument("--notebook-id", "--id", required=True, help="ID del notebook")
+    p_history.add_argument("--limit", type=int, default=20, help="Turnos locales a mostrar (default: 20)")
+    p_history.add_argument("--thread", help="Solo los turnos de este hilo")
+    p_history.add_argument("--remote", action="store_true",
+                           help="Historial completo de NotebookLM (espejo local, sincronización incremental)")
+    p_history.add_argument("--search", help="Buscar texto en el historial de NotebookLM")
+    p_history.add_argument("--export", metavar="ARCHIVO",
+                           help="Exportar el historial de NotebookLM a JSONL ('-' = stdout)")
+    p_history.add_argument("--offline", action="store_true", help="No sincronizar: solo el espejo local")
+    p_history.add_argument("--full", action="store_true", help="No recortar preguntas ni respuestas")
 
     p_config = sub.add_parser("configure", help="Configurar persona del chat")
     p_config.add_argument("--notebook-id", "--id", required=True, help="ID del notebook")
     p_config.add_argument("--goal", choices=["default", "learning", "custom"])
     p_config.add_argument("--length", choices=["default", "longer", "shorter"])
     p_config.add_argument("--prompt", help="Prompt personalizado")
+    p_config.add_argument("--persona", help="Preset (default, tutor, breve, detallado o de data/personas.json)")
+    p_config.add_argument("--force", action="store_true", help="Aplicar aunque ya sea la configuración registrada")
+
+    p_cit = sub.add_parser("citations", help="Buscar en las citas de respuestas anteriores")
+    p_cit.add_argument("--search", "-s", help="Texto citado (o pregunta) a buscar")
+    p_cit.add_argument("--source", help="Respuestas que citaron esta fuente (ID o prefijo)")
+    p_cit.add_argument("--notebook-id", "--id", help="Solo este notebook")
+    p_cit.add_argument("--limit", type=int, default=20, help="Máximo de resultados (default: 20)")
+
+    p_cache = sub.add_parser("cache", help="Caché de respuestas")
+    p_cache.add_argument("action", choices=["stats", "clear"])
+    p_cache.add_argument("--notebook-id", "--id", help="Limpiar solo este notebook")
 
     args = parser.parse_args()
 
     # Resolver notebook ID
     from nlm_notebook import _resolve_id, _get_active_id
 
-    if args.command == "ask":
+    if args.command == "ask" and (args.all or args.tag or args.ids):
+        if args.follow_up or args.continue_ or args.thread or args.source_ids or args.stream:
+            print("ERROR: --follow-up, --continue, --thread, --source-ids y --stream "
+                  "no se combinan con --all/--tag/--ids.")
+            sys.exit(1)
+        notebooks = _select_notebooks(args.all, args.tag, args.ids)
+        if not notebooks:
+            print("ERROR: Ningún notebook de la biblioteca coincide (¿nlm_notebook.py sync?).")
+            sys.exit(1)
+        sys.exit(cmd_ask_many(notebooks, args.question, args.deadline, cache_mode=args.cache_mode,
+                              ndjson=args.ndjson, similarity=args.similarity))
+    elif args.command == "ask":
         nid = None
         if args.notebook_url:
             nid = _resolve_id(args.notebook_url)
@@ -127,11 +737,36 @@ def main():
         if not nid:
             print("ERROR: Especifica --notebook-id, --notebook-url, o activa un notebook.")
             sys.exit(1)
-        sys.exit(cmd_ask(nid, args.question, args.source_ids, args.follow_up))
+        thread, follow_up, cache_mode = nlm_conversations.DEFAULT_THREAD, args.follow_up, args.cache_mode
+        if args.continue_ or args.thread:
+            thread = args.thread or nlm_conversations.DEFAULT_THREAD
+            follow_up = follow_up or nlm_conversations.current(nid, thread)
+            # Dentro de un hilo la respuesta depende de la conversación: no se cachea
+            cache_mode = "off"
+        sys.exit(cmd_ask(nid, args.question, args.source_ids, follow_up, cache_mode,
+                         args.stream, args.ndjson, thread, args.similarity, args.persona))
+    elif args.command == "ask-batch":
+        nid = _resolve_id(args.notebook_id) if args.notebook_id else _get_active_id()
+        if not nid:
+            print("ERROR: Especifica --notebook-id o activa un notebook.")
+            sys.exit(1)
+        questions = _read_questions(args.file)
+        sys.exit(cmd_ask_batch(nid, questions, args.source_ids, args.concurrency, args.order,
+                               args.cache_mode, args.similarity, args.persona))
     elif args.command == "history":
-        sys.exit(cmd_history(_resolve_id(args.notebook_id)))
+        sys.exit(cmd_history(_resolve_id(args.notebook_id), args.limit, args.thread, args.remote,
+                             args.full, args.search, args.export, args.offline))
     elif args.command == "configure":
-        sys.exit(cmd_configure(_resolve_id(args.notebook_id), args.goal, args.length, args.prompt))
+        if args.persona and (args.goal or args.length or args.prompt):
+            print("ERROR: --persona no se combina con --goal, --length o --prompt.")
+            sys.exit(1)
+        sys.exit(cmd_configure(_resolve_id(args.notebook_id), args.goal, args.length, args.prompt,
+                               args.persona, args.force))
+    elif args.command == "citations":
+        nid = _resolve_id(args.notebook_id) if args.notebook_id else None
+        sys.exit(cmd_citations(args.search, args.source, nid, args.limit))
+    elif args.command == "cache":
+        sys.exit(cmd_cache(args.action, _resolve_id(args.notebook_id) if args.notebook_id else None))
 
 
 if __name__ == "__main__":
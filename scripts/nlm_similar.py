@@ -0,0 +1,126 @@
+"""
+Preguntas casi iguales (tablas `question_index` y `question_bands` de nlm_store).
+
+Cada pregunta cacheada se resume en una firma MinHash de NUM_PERM valores
+sobre sus trigramas de caracteres (sin acentos ni puntuación). La firma se
+parte en BANDS bandas para LSH: dos preguntas son candidatas si coinciden
+en alguna banda, y la similitud que se informa es la fracción de valores
+iguales de sus firmas (estimación de Jaccard). Todo en Python puro, sin
+modelos ni dependencias, para que funcione sin red.
+
+Que dos preguntas compartan casi todos los trigramas no significa que
+pregunten lo mismo ("ventajas" / "desventajas", "1914" / "1918"): por eso
+la reutilización es opcional (SIMILARITY_THRESHOLD = 0 por defecto) y
+compatible() descarta pares con números, negaciones o antónimos con
+prefijo distintos.
+"""
+
+import hashlib
+import os
+import random
+import unicodedata
+from array import array
+
+import nlm_store
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+
+# Similitud mínima para reutilizar una respuesta (0 = desactivada, por defecto)
+SIMILARITY_THRESHOLD = float(os.environ.get("NLM_SIMILARITY", 0))
+
+_NEGATIONS = {"no", "ni", "nunca", "jamas", "sin", "tampoco", "not", "never", "without", "nor"}
+# Prefijos que invierten el sentido: ventajas/desventajas, posible/imposible, likely/unlikely
+_ANTONYM_PREFIXES = ("des", "dis", "in", "im", "ir", "un", "non", "anti")
+
+_PRIME = (1 << 61) - 1
+_MASK = (1 << 32) - 1
+# Permutaciones fijas: las firmas guardadas deben seguir siendo comparables entre procesos
+_rng = random.Random(0x4E4C4D)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+
+def normalize(text: str) -> str:
+    """Minúsculas, sin acentos y solo letras, números y espacios simples."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    kept = "".join(c if c.isalnum() else " " for c in decomposed if not unicodedata.combining(c))
+    return " ".join(kept.split())
+
+
+def shingles(text: str) -> set[int]:
+    """Trigramas de caracteres de la pregunta normalizada, como enteros de 64 bits."""
+    norm = f" {normalize(text)} "
+    grams = {norm[i:i + SHINGLE_SIZE] for i in range(max(1, len(norm) - SHINGLE_SIZE + 1))}
+    return {int.from_bytes(hashlib.blake2b(g.encode(), digest_size=8).digest(), "big") for g in grams}
+
+
+def signature(text: str) -> array:
+    """Firma MinHash (NUM_PERM enteros de 32 bits)."""
+    hashed = shingles(text)
+    return array("I", (min((a * x + b) % _PRIME for x in hashed) & _MASK for a, b in _PERMUTATIONS))
+
+
+def similarity(sig_a: array, sig_b: array) -> float:
+    """Estimación de la similitud de Jaccard entre dos firmas."""
+    return sum(a == b for a, b in zip(sig_a, sig_b)) / NUM_PERM
+
+
+def compatible(question_a: str, question_b: str) -> bool:
+    """False si difieren en números, negaciones o una palabra y su antónimo con prefijo."""
+    words_a, words_b = set(normalize(question_a).split()), set(normalize(question_b).split())
+    if {w for w in words_a if w.isdigit()} != {w for w in words_b if w.isdigit()}:
+        return False
+    if words_a & _NEGATIONS != words_b & _NEGATIONS:
+        return False
+    for words, others in ((words_a, words_b), (words_b, words_a)):
+        for word in words - others:
+            for prefix in _ANTONYM_PREFIXES:
+                if word.startswith(prefix) and word[len(prefix):] in others:
+                    return False
+    return True
+
+
+def _buckets(sig: array) -> list[str]:
+    return [
+        f"{band}:" + hashlib.blake2b(sig[band * ROWS:(band + 1) * ROWS].tobytes(), digest_size=8).hexdigest()
+        for band in range(BANDS)
+    ]
+
+
+def index(key: str, scope: str, question: str):
+    """Registra la pregunta de la entrada `key` de la caché dentro de `scope`."""
+    sig = signature(question)
+    conn = nlm_store.connect()
+    with conn:
+        conn.execute("DELETE FROM question_bands WHERE key = ?", (key,))
+        conn.execute(
+            "INSERT OR REPLACE INTO question_index (key, scope, signature) VALUES (?, ?, ?)",
+            (key, scope, sig.tobytes()),
+        )
+        conn.executemany(
+            "INSERT INTO question_bands (scope, bucket, key) VALUES (?, ?, ?)",
+            [(scope, bucket, key) for bucket in _buckets(sig)],
+        )
+
+
+def find(scope: str, question: str, threshold: float = SIMILARITY_THRESHOLD) -> list[tuple[float, str]]:
+    """Entradas de `scope` con similitud >= threshold, de más a menos parecida: [(similitud, key)]."""
+    if threshold <= 0:
+        return []
+    sig = signature(question)
+    buckets = _buckets(sig)
+    rows = nlm_store.connect().execute(
+        "SELECT DISTINCT i.key, i.signature FROM question_bands b "
+        "JOIN question_index i ON i.key = b.key "
+        f"WHERE b.scope = ? AND b.bucket IN ({','.join('?' * len(buckets))})",
+        (scope, *buckets),
+    ).fetchall()
+
+    matches = []
+    for key, blob in rows:
+        score = similarity(sig, array("I", blob))
+        if score >= threshold:
+            matches.append((score, key))
+    return sorted(matches, reverse=True)
@@ -4,11 +4,22 @@ Gestión de fuentes: detección automática de tipo, añadir individuales y batc
 """
 
 import argparse
+import asyncio
+import fnmatch
+import hashlib
+import itertools
+import json
+import os
 import re
 import sys
+import time
+import unicodedata
 from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
-from nlm_client import _create_client, run_async
+import nlm_cache
+import nlm_manifest
+from nlm_client import _create_client, borrow_client, run_async
 
 # Extensiones soportadas para archivos locales
 FILE_EXTENSIONS = {
@@ -17,41 +28,55 @@ FILE_EXTENSIONS = {
     ".mp3", ".wav", ".m4a", ".mp4",
 }
 
-# Patrones de detección automática
-YOUTUBE_PATTERNS = [
-    re.compile(r"(?:https?://)?(?:www\.)?youtube\.com/watch\?v=[\w-]+"),
-    re.compile(r"(?:https?://)?youtu\.be/[\w-]+"),
-    re.compile(r"(?:https?://)?(?:www\.)?youtube\.com/shorts/[\w-]+"),
+# Fuentes simultáneas por tipo al añadir varias (NLM_INGEST_LIMITS='{"file": 4}' las ajusta).
+# Las llamadas siguen pasando además por la cuota "upload" de nlm_client.
+INGEST_LIMITS = {"file": 2, "url": 6, "youtube": 4, "drive": 4, "text": 6}
+# Fuentes en curso o esperando a informarse (acota lo que se lee por delante con --dir)
+INGEST_QUEUE = 32
+
+# Detección automática de fuentes remotas: (tipo, literal, patrón) en orden de
+# prioridad. El literal descarta con un `in` barato antes de probar la regex.
+SOURCE_RULES = [
+    ("youtube", "youtu", re.compile(r"youtube\.com/(?:watch\?v=|shorts/)[\w-]+|youtu\.be/[\w-]+")),
+    ("drive", "google.com/", re.compile(r"(?:drive|docs)\.google\.com/")),
 ]
 
-DRIVE_PATTERNS = [
-    re.compile(r"(?:https?://)?drive\.google\.com/"),
-    re.compile(r"(?:https?://)?docs\.google\.com/"),
+_DRIVE_ID_PATTERNS = [
+    re.compile(r"/d/([a-zA-Z0-9_-]+)"),
+    re.compile(r"id=([a-zA-Z0-9_-]+)"),
 ]
 
+# Más largo que esto (o con saltos de línea) no es una ruta: no se consulta el disco
+_MAX_PATH = 4096
 
-def detect_source_type(source: str) -> str:
+
+def _path_exists(source: str) -> bool:
+    try:
+        return os.path.exists(os.path.expanduser(source))
+    except (OSError, ValueError):
+        return False
+
+
+def detect_source_type(source: str, exists=_path_exists) -> str:
     """
     Detecta automáticamente el tipo de fuente.
     Retorna: 'youtube', 'drive', 'url', 'file', 'text'
+    Solo se consulta el disco (con `exists`) para lo que no es una fuente remota
+    ni un archivo por extensión.
     """
-    # YouTube
-    for pattern in YOUTUBE_PATTERNS:
-        if pattern.search(source):
-            return "youtube"
-
-    # Google Drive / Docs
-    for pattern in DRIVE_PATTERNS:
-        if pattern.search(source):
-            return "drive"
+    for stype, literal, pattern in SOURCE_RULES:
+        if literal in source and pattern.search(source):
+            return stype
 
     # URL genérica
     if source.startswith(("http://", "https://")):
         return "url"
 
-    # Archivo local
-    path = Path(source).expanduser()
-    if path.exists() or path.suffix.lower() in FILE_EXTENSIONS:
+    # Archivo local: por extensión (aunque aún no exista), o si existe en disco
+    # (también un nombre suelto del directorio actual)
+    if os.path.splitext(source)[1].lower() in FILE_EXTENSIONS:
+        return "file"
+    if source and len(source) <= _MAX_PATH and "\n" not in source and exists(source):
         return "file"
 
     # Texto (>200 chars o no coincide con nada)
@@ -65,91 +90,496 @@ def detect_source_type(source: str) -> str:
     return "text"
 
 
-async def add_source(client, notebook_id: str, source: str, source_type: str = None, title: str = None):
-    """Añade una fuente a un notebook, detectando tipo automáticamente."""
-    stype = source_type or detect_source_type(source)
+def _name_key(name: str) -> str:
+    # Sin distinguir mayúsculas ni forma Unicode: un acierto se confirma con stat
+    return unicodedata.normalize("NFC", name).casefold()
 
-    try:
-        if stype == "youtube":
-            result = await client.sources.add_youtube(notebook_id, source)
-            print(f"  YOUTUBE: {source} → {getattr(result, 'title', 'OK')}")
-
-        elif stype == "url":
-            # Asegurar https://
-            url = source if source.startswith("http") else f"https://{source}"
-            result = await client.sources.add_url(notebook_id, url)
-            print(f"  URL: {url} → {getattr(result, 'title', 'OK')}")
-
-        elif stype == "file":
-            path = Path(source).expanduser().resolve()
-            if not path.exists():
-                print(f"  ERROR: Archivo no encontrado: {path}", file=sys.stderr)
-                return None
-            result = await client.sources.add_file(notebook_id, path)
-            print(f"  ARCHIVO: {path.name} → {getattr(result, 'title', 'OK')}")
-
-        elif stype == "text":
-            text_title = title or source[:50].strip() + "..."
-            result = await client.sources.add_text(notebook_id, text_title, source)
-            print(f"  TEXTO: '{text_title}' → OK")
-
-        elif stype == "drive":
-            # Para Drive necesitamos extraer file_id de la URL
-            file_id = _extract_drive_id(source)
-            if not file_id:
-                print(f"  ERROR: No se pudo extraer file_id de: {source}", file=sys.stderr)
-                return None
-            drive_title = title or f"Drive: {file_id[:12]}..."
-            result = await client.sources.add_drive(
-                notebook_id, file_id, drive_title,
-                "application/vnd.google-apps.document"
-            )
-            print(f"  DRIVE: {file_id} → {getattr(result, 'title', 'OK')}")
 
-        else:
-            print(f"  ERROR: Tipo desconocido: {stype}", file=sys.stderr)
+class _DirListings:
+    """
+    Existencia de rutas a partir de un listado por directorio: un solo scandir
+    por carpeta en lugar de un stat por entrada. Solo los aciertos (archivos
+    que de verdad están) se confirman con os.path.exists.
+    """
+
+    def __init__(self):
+        self._names: dict[str, frozenset | None] = {}
+
+    def _listing(self, directory: str):
+        names = self._names.get(directory, ())
+        if names == ():
+            try:
+                with os.scandir(directory) as entries:
+                    names = frozenset(_name_key(entry.name) for entry in entries)
+            except (FileNotFoundError, NotADirectoryError):
+                names = frozenset()
+            except (OSError, ValueError):
+                names = None  # p. ej. sin permiso de lectura: stat individual
+            self._names[directory] = names
+        return names
+
+    def exists(self, source: str) -> bool:
+        path = os.path.expanduser(source)
+        directory, name = os.path.split(path)
+        if name in ("", ".", ".."):
+            return _path_exists(source)
+        names = self._listing(directory or os.curdir)
+        if names is not None and _name_key(name) not in names:
+            return False
+        return _path_exists(source)
+
+
+def classify_sources(sources):
+    """
+    Clasifica muchas fuentes de una vez: genera (fuente, tipo) en el mismo
+    orden. Las comprobaciones en disco comparten un listado por directorio
+    (tomado la primera vez que se necesita) en lugar de un stat por fuente.
+    """
+    exists = _DirListings().exists
+    for source in sources:
+        yield source, detect_source_type(source, exists)
+
+
+def _normalize_url(url: str) -> str:
+    """https, host en minúsculas, sin fragmento, sin / final y query ordenada."""
+    parts = urlsplit(url if "://" in url else f"https://{url}")
+    host = parts.netloc.lower().removesuffix(":443").removesuffix(":80")
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit(("https", host, parts.path.rstrip("/"), query, ""))
+
+
+def _youtube_id(url: str) -> str | None:
+    parts = urlsplit(url if "://" in url else f"https://{url}")
+    if parts.netloc.lower().endswith("youtu.be"):
+        return parts.path.strip("/") or None
+    if parts.path.startswith("/shorts/"):
+        return parts.path.split("/")[2] or None
+    return dict(parse_qsl(parts.query)).get("v")
+
+
+def content_key(source: str, source_type: str) -> str | None:
+    """
+    Clave de contenido de una fuente para el manifiesto (nlm_manifest), o None
+    si no se puede calcular (archivo inexistente, URL de Drive sin id...).
+    """
+    if source_type == "file":
+        path = Path(source).expanduser()
+        if not path.is_file():
             return None
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            while chunk := f.read(1 << 20):
+                digest.update(chunk)
+        return f"file:{digest.hexdigest()}"
+    if source_type == "url":
+        return f"url:{_normalize_url(source)}"
+    if source_type == "youtube":
+        video_id = _youtube_id(source)
+        return f"youtube:{video_id}" if video_id else f"url:{_normalize_url(source)}"
+    if source_type == "drive":
+        file_id = _extract_drive_id(source)
+        return f"drive:{file_id}" if file_id else None
+    if source_type == "text":
+        return f"text:{hashlib.sha256(source.encode()).hexdigest()}"
+    return None
 
-        return result
 
+async def _ingest(client, notebook_id: str, source: str, stype: str, title: str = None):
+    """Añade una fuente de tipo conocido. Devuelve (resultado, línea de informe); lanza si falla."""
+    if stype == "youtube":
+        result = await client.sources.add_youtube(notebook_id, source)
+        return result, f"YOUTUBE: {source} → {getattr(result, 'title', 'OK')}"
+
+    if stype == "url":
+        # Asegurar https://
+        url = source if source.startswith("http") else f"https://{source}"
+        result = await client.sources.add_url(notebook_id, url)
+        return result, f"URL: {url} → {getattr(result, 'title', 'OK')}"
+
+    if stype == "file":
+        path = Path(source).expanduser().resolve()
+        if not path.exists():
+            raise FileNotFoundError(f"Archivo no encontrado: {path}")
+        result = await client.sources.add_file(notebook_id, path)
+        return result, f"ARCHIVO: {path.name} → {getattr(result, 'title', 'OK')}"
+
+    if stype == "text":
+        text_title = title or source[:50].strip() + "..."
+        result = await client.sources.add_text(notebook_id, text_title, source)
+        return result, f"TEXTO: '{text_title}' → OK"
+
+    if stype == "drive":
+        # Para Drive necesitamos extraer file_id de la URL
+        file_id = _extract_drive_id(source)
+        if not file_id:
+            raise ValueError(f"No se pudo extraer file_id de: {source}")
+        drive_title = title or f"Drive: {file_id[:12]}..."
+        result = await client.sources.add_drive(
+            notebook_id, file_id, drive_title,
+            "application/vnd.google-apps.document"
+        )
+        return result, f"DRIVE: {file_id} → {getattr(result, 'title', 'OK')}"
+
+    raise ValueError(f"Tipo desconocido: {stype}")
+
+
+async def _ingest_once(client, notebook_id: str, source: str, stype: str, title: str = None,
+                       force: bool = False, inflight: dict = None):
+    """
+    _ingest() pasando por el manifiesto: si el contenido ya se añadió al notebook
+    no se vuelve a subir. Devuelve (resultado o source_id existente, línea, estado)
+    con estado "added" o "unchanged". `inflight` ({clave: Future}) evita subir dos
+    veces el mismo contenido dentro de una misma tanda.
+    """
+    # Leer y hashear un archivo grande no debe bloquear al resto de subidas
+    key = await asyncio.to_thread(content_key, source, stype)
+    if key and not force:
+        source_id = nlm_manifest.lookup(notebook_id, key)
+        if source_id:
+            return source_id, f"SIN CAMBIOS: {source[:80]} → [{source_id[:8]}...]", "unchanged"
+
+    owner = None
+    if key and inflight is not None:
+        if key in inflight:
+            source_id = await asyncio.shield(inflight[key])
+            if source_id:
+                return source_id, f"SIN CAMBIOS: {source[:80]} → [{source_id[:8]}...]", "unchanged"
+        else:
+            owner = inflight[key] = asyncio.get_running_loop().create_future()
+
+    result = None
+    try:
+        result, line = await _ingest(client, notebook_id, source, stype, title)
+    finally:
+        if owner is not None:
+            # Si falló, los duplicados que esperaban lo intentan por su cuenta
+            owner.set_result(getattr(result, "id", None))
+    if key and getattr(result, "id", None):
+        nlm_manifest.record(notebook_id, key, result.id, source, stype)
+    return result, line, "added"
+
+
+async def add_source(client, notebook_id: str, source: str, source_type: str = None, title: str = None,
+                     force: bool = False):
+    """
+    Añade una fuente a un notebook, detectando tipo automáticamente. Si ya se
+    añadió el mismo contenido devuelve el source_id existente sin subir nada.
+    """
+    stype = source_type or detect_source_type(source)
+    try:
+        result, line, _ = await _ingest_once(client, notebook_id, source, stype, title, force)
     except Exception as e:
         print(f"  ERROR añadiendo {stype} '{source[:60]}': {e}", file=sys.stderr)
         return None
+    print(f"  {line}")
+    return result
+
+
+def _ingest_limits(overrides: dict = None) -> dict:
+    limits = dict(INGEST_LIMITS)
+    raw = os.environ.get("NLM_INGEST_LIMITS")
+    if raw:
+        limits.update(json.loads(raw))
+    limits.update(overrides or {})
+    return limits
+
+
+def iter_directory(root: str, pattern: str = None, recursive: bool = False):
+    """
+    Archivos admitidos (FILE_EXTENSIONS) bajo `root`, recorridos con os.scandir
+    según se piden. `pattern` es un glob sobre el nombre (o sobre la ruta
+    relativa si contiene "/"). Se omiten ocultos y enlaces a directorios.
+    """
+    root = Path(root).expanduser()
+    pending = [root]
+    while pending:
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError as e:
+            print(f"  ERROR leyendo {directory}: {e}", file=sys.stderr)
+            continue
+        subdirs = []
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                if recursive:
+                    subdirs.append(entry.path)
+                continue
+            if Path(entry.name).suffix.lower() not in FILE_EXTENSIONS or not entry.is_file():
+                continue
+            if pattern:
+                target = os.path.relpath(entry.path, root) if "/" in pattern else entry.name
+                if not fnmatch.fnmatch(target, pattern):
+                    continue
+            yield entry.path
+        # Pila en orden inverso: los subdirectorios salen en orden alfabético
+        pending.extend(reversed(subdirs))
+
+
+async def add_sources(client, notebook_id: str, sources, source_type: str = None,
+                      title: str = None, limits: dict = None, force: bool = False) -> list[dict]:
+    """
+    Añade varias fuentes sobre un mismo cliente, en paralelo con un máximo de
+    fuentes simultáneas por tipo (INGEST_LIMITS, NLM_INGEST_LIMITS o `limits`).
+    `sources` puede ser un iterador perezoso (p. ej. iter_directory): se
+    consume a medida que hay hueco en una cola de INGEST_QUEUE fuentes, así
+    que las subidas empiezan mientras aún se recorre.
+    Informa en el orden de entrada, cada una con su tiempo, y devuelve un
+    registro por fuente: {source, type, status, result, error, elapsed}, con
+    status "added", "unchanged" (ya en el manifiesto) o "error".
+    """
+    limits = _ingest_limits(limits)
+    semaphores = {}
+    inflight = {}
+
+    async def _one(source: str) -> dict:
+        stype = source_type or detect_source_type(source)
+        record = {"source": source, "type": stype, "status": "error", "result": None, "error": None}
+        semaphore = semaphores.setdefault(stype, asyncio.Semaphore(max(1, limits.get(stype, 1))))
+        async with semaphore:
+            started = time.monotonic()
+            try:
+                record["result"], record["line"], record["status"] = await _ingest_once(
+                    client, notebook_id, source, stype, title, force, inflight)
+            except Exception as e:
+                record["error"] = str(e)
+            record["elapsed"] = time.monotonic() - started
+        return record
+
+    queue = asyncio.Queue(maxsize=INGEST_QUEUE)
+
+    async def _produce():
+        iterator = iter(sources)
+        # Un iterador perezoso puede bloquear (recorrer directorios): en un hilo
+        lazy = not isinstance(sources, (list, tuple))
+        while True:
+            source = await asyncio.to_thread(next, iterator, None) if lazy else next(iterator, None)
+            if source is None:
+                break
+            await queue.put(asyncio.create_task(_one(source)))
+        await queue.put(None)
+
+    producer = asyncio.create_task(_produce())
+    records = []
+    try:
+        # En orden de entrada: cada línea sale en cuanto están listas las anteriores
+        while (task := await queue.get()) is not None:
+            record = await task
+            if record["error"] is None:
+                print(f"  {record.pop('line')} ({record['elapsed']:.1f}s)")
+            else:
+                print(f"  ERROR añadiendo {record['type']} '{record['source'][:60]}': {record['error']} "
+                      f"({record['elapsed']:.1f}s)", file=sys.stderr)
+            records.append(record)
+        await producer
+    finally:
+        producer.cancel()
+        while not queue.empty():
+            task = queue.get_nowait()
+            if task is not None:
+                task.cancel()
+    return records
+
+
+# === Espera a que las fuentes terminen de procesarse ===
+
+READY_TIMEOUT = 600
+# Intervalo entre sources.list: vuelve al mínimo cuando alguna fuente cambia y crece si no
+POLL_MIN, POLL_MAX, POLL_GROWTH = 1.0, 15.0, 1.5
+
+
+# Estado de una fuente según su `status`: nombre (enum o texto) o código numérico
+_READY_STATUSES = {"ready", "enabled", "complete", "completed", 2}
+_FAILED_STATUSES = {"error", "failed", 3}
+
+
+def _source_state(src) -> str | None:
+    """
+    "ready", "failed" o None si sigue procesándose (src = None: ya no existe).
+    Sin `status` reconocible, la fuente no cuenta como lista.
+    """
+    if src is None:
+        return "failed"
+    status = getattr(src, "status", None)
+    status = getattr(status, "name", status)
+    if isinstance(status, str):
+        status = status.lower()
+    if status in _FAILED_STATUSES:
+        return "failed"
+    if status in _READY_STATUSES:
+        return "ready"
+    return None
+
+
+class ReadinessPoller:
+    """
+    Sigue todas las fuentes en proceso de un notebook con un único bucle sobre
+    sources.list (intervalo adaptativo y un deadline global). track() añade
+    fuentes en cualquier momento; wait() espera a las indicadas (o a todas) y
+    devuelve {"ready": [...], "failed": [...], "pending": [...], "error": [...]},
+    donde pending son las que no estaban listas al vencer el deadline y error
+    las que quedaban por comprobar si sources.list falló (en self.error).
+    """
+
+    def __init__(self, client, notebook_id: str, timeout: float = READY_TIMEOUT, on_change=None):
+        self.client = client
+        self.notebook_id = notebook_id
+        self.deadline = time.monotonic() + timeout
+        self.on_change = on_change
+        self.polls = 0
+        self.error = None
+        self._states: dict[str, asyncio.Future] = {}
+        self._task = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+        return False
+
+    def track(self, source_ids):
+        loop = asyncio.get_running_loop()
+        for sid in source_ids:
+            if sid not in self._states:
+                self._states[sid] = loop.create_future()
+        if (self._task is None or self._task.done()) and any(not f.done() for f in self._states.values()):
+            self._task = asyncio.create_task(self._run())
+
+    async def wait(self, source_ids=None) -> dict:
+        ids = list(self._states) if source_ids is None else list(source_ids)
+        self.track(ids)
+        states = await asyncio.gather(*(asyncio.shield(self._states[sid]) for sid in ids))
+        report = {"ready": [], "failed": [], "pending": [], "error": []}
+        for sid, state in zip(ids, states):
+            report[state].append(sid)
+        return report
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        interval = POLL_MIN
+        try:
+            while pending := {sid: f for sid, f in self._states.items() if not f.done()}:
+                if time.monotonic() >= self.deadline:
+                    for future in pending.values():
+                        future.set_result("pending")
+                    return
+
+                sources = {src.id: src for src in await self.client.sources.list(self.notebook_id)}
+                self.polls += 1
+                changed = False
+                for sid, future in pending.items():
+                    state = _source_state(sources.get(sid))
+                    if state:
+                        future.set_result(state)
+                        changed = True
+                        if self.on_change:
+                            self.on_change(sid, sources.get(sid), state)
+
+                interval = POLL_MIN if changed else min(POLL_MAX, interval * POLL_GROWTH)
+                await asyncio.sleep(max(0.0, min(interval, self.deadline - time.monotonic())))
+        except Exception as e:
+            # sources.list falló (ya reintentado en nlm_client): estado "error", no excepción,
+            # para que quien espera siga con lo que ya tiene
+            self.error = e
+            for future in self._states.values():
+                if not future.done():
+                    future.set_result("error")
+
+
+def _print_ready(sid: str, src, state: str):
+    title = getattr(src, "title", None) or "(sin título)"
+    label = "LISTA" if state == "ready" else "FALLIDA"
+    print(f"  {label}: [{sid[:8]}...] {title}")
+
+
+def _print_wait_report(report: dict, poller: ReadinessPoller, elapsed: float):
+    print(f"\nESPERA: {len(report['ready'])} listas, {len(report['failed'])} fallidas, "
+          f"{len(report['pending'])} aún en proceso ({poller.polls} consultas, {elapsed:.0f}s)")
+    if report["error"]:
+        print(f"  ERROR comprobando {len(report['error'])} fuente(s): {poller.error}")
 
 
 def _extract_drive_id(url: str) -> str | None:
     """Extrae file_id de una URL de Google Drive/Docs."""
-    patterns = [
-        re.compile(r"/d/([a-zA-Z0-9_-]+)"),
-        re.compile(r"id=([a-zA-Z0-9_-]+)"),
-        re.compile(r"/document/d/([a-zA-Z0-9_-]+)"),
-        re.compile(r"/spreadsheets/d/([a-zA-Z0-9_-]+)"),
-        re.compile(r"/presentation/d/([a-zA-Z0-9_-]+)"),
-    ]
-    for p in patterns:
-        m = p.search(url)
+    for pattern in _DRIVE_ID_PATTERNS:
+        m = pattern.search(url)
         if m:
             return m.group(1)
     return None
 
 
-def cmd_add(notebook_id: str, sources: list[str], source_type: str = None, title: str = None):
-    """Añade una o más fuentes a un notebook."""
+def cmd_add(notebook_id: str, sources, source_type: str = None, title: str = None,
+            limits: dict = None, force: bool = False, wait: float = None):
+    """
+    Añade fuentes a un notebook (en paralelo, con límite por tipo). `sources` puede ser un iterador.
+    wait: segundos máximos para esperar a que terminen de procesarse (None = no esperar).
+    """
 
     async def _add():
-        async with await _create_client() as client:
-            print(f"Añadiendo {len(sources)} fuente(s) a [{notebook_id[:8]}...]:")
+        async with borrow_client() as client:
+            count = f"{len(sources)} fuente(s)" if isinstance(sources, list) else "fuentes"
+            print(f"Añadiendo {count} a [{notebook_id[:8]}...]:")
+            started = time.monotonic()
+            records = await add_sources(client, notebook_id, sources, source_type, title, limits, force)
+            added = sum(r["status"] == "added" for r in records)
+            unchanged = sum(r["status"] == "unchanged" for r in records)
+            fail = len(records) - added - unchanged
+            if added:
+                # Las respuestas cacheadas del notebook se validan contra la huella de fuentes
+                nlm_cache.invalidate_fingerprint(notebook_id)
+            print(f"\nRESULTADO: {added} añadidas, {unchanged} sin cambios, {fail} errores "
+                  f"({time.monotonic() - started:.1f}s)")
+            if wait is not None:
+                ids = [_record_source_id(r) for r in records if r["status"] != "error"]
+                async with ReadinessPoller(client, notebook_id, wait, _print_ready) as poller:
+                    report = await poller.wait(filter(None, ids))
+                _print_wait_report(report, poller, time.monotonic() - started)
+                fail += len(report["failed"]) + len(report["pending"]) + len(report["error"])
+            return 0 if fail == 0 else 1
+
+    return run_async(_add())
+
+
+def _record_source_id(record: dict) -> str | None:
+    """source_id de un registro de add_sources (resultado nuevo o id del manifiesto)."""
+    result = record["result"]
+    return result if isinstance(result, str) else getattr(result, "id", None)
+
+
+def cmd_delete(notebook_id: str, source_ids: list[str]):
+    """Elimina fuentes de un notebook."""
+
+    async def _delete():
+        async with borrow_client() as client:
             ok, fail = 0, 0
-            for src in sources:
-                result = await add_source(client, notebook_id, src, source_type, title)
-                if result:
+            deleted = []
+            for sid in source_ids:
+                try:
+                    await client.sources.delete(notebook_id, sid)
+                    print(f"  ELIMINADA: {sid}")
+                    deleted.append(sid)
                     ok += 1
-                else:
+                except Exception as e:
+                    print(f"  ERROR {sid}: {e}")
                     fail += 1
-            print(f"\nRESULTADO: {ok} añadidas, {fail} errores")
+            if ok:
+                nlm_cache.invalidate_fingerprint(notebook_id)
+                nlm_manifest.forget(notebook_id, deleted)
+            print(f"\nRESULTADO: {ok} eliminadas, {fail} errores")
             return 0 if fail == 0 else 1
 
-    return run_async(_add())
+    return run_async(_delete())
 
 
 def cmd_list(notebook_id: str):
@@ -168,6 +598,49 @@ def cmd_list(notebook_id: str):
     return run_async(_list())
 
 
+def cmd_wait(notebook_id: str, source_ids: list[str] = None, timeout: float = READY_TIMEOUT):
+    """Espera a que las fuentes (todas las que estén en proceso, o las indicadas) estén listas."""
+
+    async def _wait():
+        started = time.monotonic()
+        async with borrow_client() as client:
+            ids = source_ids
+            if not ids:
+                ids = [src.id for src in await client.sources.list(notebook_id) if _source_state(src) != "ready"]
+            if not ids:
+                print("TODAS LISTAS")
+                return 0
+            print(f"Esperando {len(ids)} fuente(s) de [{notebook_id[:8]}...] (máx. {timeout:.0f}s):")
+            async with ReadinessPoller(client, notebook_id, timeout, _print_ready) as poller:
+                report = await poller.wait(ids)
+        _print_wait_report(report, poller, time.monotonic() - started)
+        return 0 if not report["failed"] and not report["pending"] and not report["error"] else 1
+
+    return run_async(_wait())
+
+
+def cmd_reconcile(notebook_id: str, dry_run: bool = False):
+    """Contrasta el manifiesto local con las fuentes reales del notebook."""
+
+    async def _reconcile():
+        async with borrow_client() as client:
+            sources = await client.sources.list(notebook_id)
+        report = nlm_manifest.reconcile(notebook_id, sources, apply=not dry_run)
+        print(f"MANIFIESTO: {report['tracked']} fuentes al día")
+        if report["missing"]:
+            action = "se olvidarían" if dry_run else "olvidadas"
+            print(f"  Ya no existen ({len(report['missing'])}, {action}):")
+            for entry in report["missing"]:
+                print(f"    [{entry['source_id'][:8]}...] [{entry['type']}] {entry['source'][:80]}")
+        if report["untracked"]:
+            print(f"  Sin registrar ({len(report['untracked'])}, añadidas fuera de nlm_sources.py):")
+            for src in report["untracked"]:
+                print(f"    [{src.id[:8]}...] {getattr(src, 'title', None) or '(sin título)'}")
+        return 0
+
+    return run_async(_reconcile())
+
+
 def cmd_detect(source: str):
     """Detecta el tipo de una fuente (para debug)."""
     stype = detect_source_type(source)
@@ -182,13 +655,37 @@ def main():
 
     p_add = sub.add_parser("add", help="Añadir fuentes")
     p_add.add_argument("--notebook-id", "--id", required=True, help="ID del notebook")
-    p_add.add_argument("--source", "-s", action="append", required=True, help="Fuente (URL, archivo, texto)")
+    p_add.add_argument("--source", "-s", action="append", help="Fuente (URL, archivo, texto)")
+    p_add.add_argument("--dir", help="Añadir los archivos admitidos de este directorio")
+    p_add.add_argument("--glob", help="Con --dir: solo los que encajen, p. ej. '*.pdf' o 'tema1/*.md'")
+    p_add.add_argument("--recursive", "-r", action="store_true", help="Con --dir: incluir subdirectorios")
     p_add.add_argument("--type", choices=["youtube", "url", "file", "text", "drive"], help="Forzar tipo")
     p_add.add_argument("--title", help="Título para fuentes de texto/drive")
+    p_add.add_argument("--parallel", action="append", metavar="TIPO=N",
+                       help="Fuentes simultáneas de un tipo, p. ej. file=4 (repetible; "
+                            f"default: {', '.join(f'{k}={v}' for k, v in INGEST_LIMITS.items())})")
+    p_add.add_argument("--wait", nargs="?", type=float, const=READY_TIMEOUT, metavar="SEGUNDOS",
+                       help=f"Esperar a que terminen de procesarse (default: {READY_TIMEOUT:.0f}s)")
+    p_add.add_argument("--force", action="store_true",
+                       help="Añadir aunque el mismo contenido ya esté en el notebook")
+
+    p_delete = sub.add_parser("delete", help="Eliminar fuentes")
+    p_delete.add_argument("--notebook-id", "--id", required=True, help="ID del notebook")
+    p_delete.add_argument("--source-id", action="append", required=True, help="ID de la fuente (repetible)")
 
     p_list = sub.add_parser("list", help="Listar fuentes de un notebook")
     p_list.add_argument("--notebook-id", "--id", required=True, help="ID del notebook")
 
+    p_wait = sub.add_parser("wait", help="Esperar a que las fuentes terminen de procesarse")
+    p_wait.add_argument("--notebook-id", "--id", required=True, help="ID del notebook")
+    p_wait.add_argument("--source-id", action="append", help="Solo estas fuentes (repetible; default: las en proceso)")
+    p_wait.add_argument("--timeout", type=float, default=READY_TIMEOUT,
+                        help=f"Segundos máximos en total (default: {READY_TIMEOUT:.0f})")
+
+    p_reconcile = sub.add_parser("reconcile", help="Contrastar el manifiesto local con las fuentes reales")
+    p_reconcile.add_argument("--notebook-id", "--id", required=True, help="ID del notebook")
+    p_reconcile.add_argument("--dry-run", action="store_true", help="Solo informar, sin corregir el manifiesto")
+
     p_detect = sub.add_parser("detect", help="Detectar tipo de fuente")
     p_detect.add_argument("source", help="Fuente a analizar")
 
@@ -201,11 +698,36 @@ def main():
         if not nid:
             print("ERROR: No hay notebook activo. Usa --notebook-id o activa uno.")
             sys.exit(1)
-        sys.exit(cmd_add(nid, args.source, args.type, args.title))
+        limits = {}
+        for item in args.parallel or []:
+            kind, _, value = item.partition("=")
+            if kind not in INGEST_LIMITS or not value.isdigit() or int(value) < 1:
+                print(f"ERROR: --parallel espera TIPO=N con TIPO en {', '.join(INGEST_LIMITS)}: {item}")
+                sys.exit(1)
+            limits[kind] = int(value)
+        if not args.source and not args.dir:
+            print("ERROR: Indica al menos una fuente (--source) o un directorio (--dir).")
+            sys.exit(1)
+        if args.dir and not Path(args.dir).expanduser().is_dir():
+            print(f"ERROR: No es un directorio: {args.dir}")
+            sys.exit(1)
+        sources = args.source or []
+        if args.dir:
+            sources = itertools.chain(sources, iter_directory(args.dir, args.glob, args.recursive))
+        sys.exit(cmd_add(nid, sources, args.type, args.title, limits, args.force, args.wait))
+    elif args.command == "delete":
+        from nlm_notebook import _resolve_id
+        sys.exit(cmd_delete(_resolve_id(args.notebook_id), args.source_id))
     elif args.command == "list":
         from nlm_notebook import _resolve_id
         nid = _resolve_id(args.notebook_id)
         sys.exit(cmd_list(nid))
+    elif args.command == "wait":
+        from nlm_notebook import _resolve_id
+        sys.exit(cmd_wait(_resolve_id(args.notebook_id), args.source_id, args.timeout))
+    elif args.command == "reconcile":
+        from nlm_notebook import _resolve_id
+        sys.exit(cmd_reconcile(_resolve_id(args.notebook_id), args.dry_run))
     elif args.command == "detect":
         sys.exit(cmd_detect(args.source))
 
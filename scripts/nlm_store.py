@@ -0,0 +1,193 @@
+"""
+Base de datos local (SQLite) de los scripts nlm_*: caché de respuestas y
+estado por notebook. Un solo archivo en DATA_DIR, en modo WAL para que
+varios procesos (agentes en paralelo, el daemon) lean y escriban a la vez.
+"""
+
+import json
+import sqlite3
+import time
+
+from nlm_client import DATA_DIR
+
+DB_FILE = DATA_DIR / "nlm_state.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    key TEXT PRIMARY KEY,
+    notebook_id TEXT NOT NULL,
+    question TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS answers_accessed ON answers (accessed_at);
+CREATE INDEX IF NOT EXISTS answers_notebook ON answers (notebook_id);
+
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS chat_config (
+    notebook_id TEXT PRIMARY KEY,
+    config TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS source_fingerprints (
+    notebook_id TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    checked_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS conversations (
+    notebook_id TEXT NOT NULL,
+    thread TEXT NOT NULL,
+    conversation_id TEXT NOT NULL,
+    turns INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (notebook_id, thread)
+);
+
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY,
+    notebook_id TEXT NOT NULL,
+    thread TEXT NOT NULL,
+    conversation_id TEXT NOT NULL,
+    turn INTEGER,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS turns_notebook ON turns (notebook_id, id);
+
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    notebook_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    conversation_id TEXT,
+    turn INTEGER,
+    data BLOB NOT NULL,
+    synced_at REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS history_key ON history (notebook_id, key);
+CREATE INDEX IF NOT EXISTS history_notebook ON history (notebook_id, id);
+
+CREATE TABLE IF NOT EXISTS citations (
+    id INTEGER PRIMARY KEY,
+    notebook_id TEXT NOT NULL,
+    answer_id TEXT NOT NULL,
+    source_id TEXT NOT NULL,
+    citation_number INTEGER,
+    cited_text TEXT NOT NULL,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS citations_unique ON citations (answer_id, source_id, citation_number);
+CREATE INDEX IF NOT EXISTS citations_source ON citations (source_id);
+
+CREATE TABLE IF NOT EXISTS question_index (
+    key TEXT PRIMARY KEY,
+    scope TEXT NOT NULL,
+    signature BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS question_bands (
+    scope TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    key TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS question_bands_bucket ON question_bands (scope, bucket);
+CREATE INDEX IF NOT EXISTS question_bands_key ON question_bands (key);
+CREATE TABLE IF NOT EXISTS source_manifest (
+    notebook_id TEXT NOT NULL,
+    content_key TEXT NOT NULL,
+    source_id TEXT NOT NULL,
+    source TEXT NOT NULL,
+    type TEXT NOT NULL,
+    added_at REAL NOT NULL,
+    PRIMARY KEY (notebook_id, content_key)
+);
+CREATE INDEX IF NOT EXISTS source_manifest_source ON source_manifest (notebook_id, source_id);
+
+CREATE TRIGGER IF NOT EXISTS answers_ad AFTER DELETE ON answers BEGIN
+    DELETE FROM question_index WHERE key = old.key;
+    DELETE FROM question_bands WHERE key = old.key;
+END;
+"""
+
+# Cambios sobre tablas existentes, en orden. PRAGMA user_version = cuántos se aplicaron.
+_MIGRATIONS = [
+    "ALTER TABLE answers ADD COLUMN fingerprint TEXT",
+]
+
+_conn = None
+
+
+def connect() -> sqlite3.Connection:
+    """Conexión compartida del proceso (se crea la base y el esquema la primera vez)."""
+    global _conn
+    if _conn is None:
+        DB_FILE.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(DB_FILE, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        _migrate(conn)
+        _conn = conn
+    return _conn
+
+
+def _migrate(conn: sqlite3.Connection):
+    if conn.execute("PRAGMA user_version").fetchone()[0] == len(_MIGRATIONS):
+        return
+    # BEGIN IMMEDIATE: si dos procesos arrancan a la vez, solo uno aplica las migraciones
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for statement in _MIGRATIONS[version:]:
+            conn.execute(statement)
+        conn.execute(f"PRAGMA user_version = {len(_MIGRATIONS)}")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def bump(name: str, amount: int = 1):
+    """Incrementa un contador persistente."""
+    conn = connect()
+    with conn:
+        conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount),
+        )
+
+
+def counters(prefix: str = "") -> dict:
+    """Contadores cuyo nombre empieza por `prefix` (sin el prefijo)."""
+    rows = connect().execute(
+        "SELECT name, value FROM counters WHERE name LIKE ? || '%'", (prefix,)
+    )
+    return {name[len(prefix):]: value for name, value in rows}
+
+
+def get_chat_config(notebook_id: str) -> dict:
+    """Última configuración de chat aplicada al notebook ({} = la de por defecto)."""
+    row = connect().execute(
+        "SELECT config FROM chat_config WHERE notebook_id = ?", (notebook_id,)
+    ).fetchone()
+    return json.loads(row[0]) if row else {}
+
+
+def set_chat_config(notebook_id: str, config: dict):
+    """Registra la configuración de chat aplicada con `nlm_query.py configure`."""
+    conn = connect()
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO chat_config (notebook_id, config, updated_at) VALUES (?, ?, ?)",
+            (notebook_id, json.dumps(config, sort_keys=True), time.time()),
+        )
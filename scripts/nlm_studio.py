@@ -8,10 +8,9 @@ import argparse
 import sys
 from pathlib import Path
 
-from nlm_client import _create_client, run_async
+from nlm_client import DATA_DIR, _create_client, run_async
 
-SKILL_DIR = Path(__file__).parent.parent
-OUTPUTS_DIR = SKILL_DIR / "data" / "outputs"
+OUTPUTS_DIR = DATA_DIR / "outputs"
 
 
 # Mapeo de tipos a métodos de generación y descarga
@@ -216,11 +215,14 @@ def cmd_list_artifacts(notebook_id: str, studio_type: str = None):
 
 
 def _output_path(notebook_id: str, studio_type: str, ext: str, custom_path: str = None) -> Path:
-    """Genera ruta de salida para descargas."""
+    """
+    Genera ruta de salida para descargas. Siempre absoluta: con el daemon la
+    descarga la escribe otro proceso, con su propio directorio de trabajo.
+    """
     if custom_path:
-        return Path(custom_path).expanduser()
+        return Path(custom_path).expanduser().resolve()
     OUTPUTS_DIR.mkdir(parents=True, exist_ok=True)
-    return OUTPUTS_DIR / f"{notebook_id[:8]}_{studio_type}.{ext}"
+    return (OUTPUTS_DIR / f"{notebook_id[:8]}_{studio_type}.{ext}").resolve()
 
 
 def main():
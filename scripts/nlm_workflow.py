@@ -5,14 +5,19 @@ Orquestador de pipeline completo: fuentes → notebook → queries → studio 
 
 import argparse
 import sys
+import time
 
-from nlm_client import _create_client, run_async
+from nlm_client import borrow_client, run_async
+from nlm_sources import READY_TIMEOUT
 
 
 def cmd_pipeline(name: str, sources: list[str], questions: list[str] = None,
                  studio_types: list[str] = None, obsidian_path: str = None,
-                 language: str = "es"):
-    """Pipeline completo: crear notebook, añadir fuentes, queries, studio, obsidian."""
+                 language: str = "es", ready_timeout: float = READY_TIMEOUT):
+    """
+    Pipeline completo: crear notebook, añadir fuentes, queries, studio, obsidian.
+    Antes de queries y studio espera (como mucho ready_timeout s) a que las fuentes estén procesadas.
+    """
 
     async def _pipeline():
         # 1. Verificar auth
@@ -21,7 +26,7 @@ def cmd_pipeline(name: str, sources: list[str], questions: list[str] = None,
             print("\nERROR: Auth no válida. Ejecuta: python scripts/run.py nlm_auth.py setup")
             return 1
 
-        async with await _create_client() as client:
+        async with borrow_client() as client:
             # 2. Crear notebook
             print(f"\n=== CREAR NOTEBOOK: {name} ===")
             nb = await client.notebooks.create(name)
@@ -35,25 +40,43 @@ def cmd_pipeline(name: str, sources: list[str], questions: list[str] = None,
             _save_library(library)
 
             # 3. Añadir fuentes
+            source_ids = []
             if sources:
                 print(f"\n=== AÑADIR {len(sources)} FUENTES ===")
-                from nlm_sources import add_source
-                ok, fail = 0, 0
-                for src in sources:
-                    result = await add_source(client, nb.id, src)
-                    if result:
-                        ok += 1
-                    else:
-                        fail += 1
-                print(f"  Resultado: {ok} OK, {fail} errores")
+                from nlm_sources import ReadinessPoller, _record_source_id, add_sources
+                records = await add_sources(client, nb.id, sources)
+                fail = sum(r["status"] == "error" for r in records)
+                print(f"  Resultado: {len(records) - fail} OK, {fail} errores")
+                source_ids = [sid for r in records if r["status"] != "error" and (sid := _record_source_id(r))]
+
+            # Siguen procesándose: queries y studio esperan a que estén listas
+            if source_ids and (questions or studio_types):
+                print("\n=== ESPERAR FUENTES ===")
+                started = time.monotonic()
+                async with ReadinessPoller(client, nb.id, ready_timeout) as poller:
+                    report = await poller.wait(source_ids)
+                print(f"  Listas: {len(report['ready'])}, fallidas: {len(report['failed'])}, "
+                      f"en proceso: {len(report['pending'])} ({poller.polls} consultas, "
+                      f"{time.monotonic() - started:.0f}s)")
+                if report["error"]:
+                    # No bloquea el pipeline: las fuentes ya están subidas
+                    print(f"  AVISO: no se pudo comprobar {len(report['error'])} fuente(s): {poller.error}")
 
             # 4. Queries
             results = []
             if questions:
                 print(f"\n=== QUERIES ({len(questions)}) ===")
+                import nlm_citations
+                from nlm_query import _response_to_dict
                 for q in questions:
                     print(f"\n  Q: {q}")
-                    result = await client.chat.ask(nb.id, q)
+                    try:
+                        result = await client.chat.ask(nb.id, q)
+                    except Exception as e:
+                        # Ya se reintentó en nlm_client: seguir con el resto del pipeline
+                        print(f"  ERROR en query: {e}")
+                        continue
+                    nlm_citations.index_answer(nb.id, q, _response_to_dict(result))
                     print(f"  A: {result.answer[:300]}...")
                     results.append({"question": q, "answer": result.answer})
 
@@ -80,7 +103,7 @@ def cmd_pipeline(name: str, sources: list[str], questions: list[str] = None,
                         status = await generate_fn(nb.id, **kwargs)
 
                         if stype == "mind_map":
-                            output_path = OUTPUTS_DIR / f"{nb.id[:8]}_{stype}.{type_info['ext']}"
+                            output_path = (OUTPUTS_DIR / f"{nb.id[:8]}_{stype}.{type_info['ext']}").resolve()
                             await client.artifacts.download_mind_map(nb.id, str(output_path))
                             downloads.append(str(output_path))
                             print(f"  Descargado: {output_path}")
@@ -90,7 +113,7 @@ def cmd_pipeline(name: str, sources: list[str], questions: list[str] = None,
                             nb.id, status.task_id, timeout=300, poll_interval=5
                         )
                         if final.is_complete:
-                            output_path = OUTPUTS_DIR / f"{nb.id[:8]}_{stype}.{type_info['ext']}"
+                            output_path = (OUTPUTS_DIR / f"{nb.id[:8]}_{stype}.{type_info['ext']}").resolve()
                             download_fn = getattr(client.artifacts, type_info["download"])
                             await download_fn(nb.id, str(output_path))
                             downloads.append(str(output_path))
@@ -137,6 +160,8 @@ def main():
                         help="Tipos de Studio a generar (repetible)")
     parser.add_argument("--obsidian", help="Ruta en vault de Obsidian para guardar resultados")
     parser.add_argument("--language", "-l", default="es", help="Idioma (default: es)")
+    parser.add_argument("--ready-timeout", type=float, default=READY_TIMEOUT,
+                        help=f"Segundos máximos esperando a que se procesen las fuentes (default: {READY_TIMEOUT:.0f})")
 
     args = parser.parse_args()
 
@@ -151,6 +176,7 @@ def main():
         studio_types=args.studio or None,
         obsidian_path=args.obsidian,
         language=args.language,
+        ready_timeout=args.ready_timeout,
     ))
 
 
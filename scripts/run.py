@@ -2,6 +2,14 @@
 """
 Universal runner for NotebookLM skill scripts
 Ensures all scripts run with the correct virtual environment
+
+Two entry points:
+  python run.py <script_name> [args...]   - run any script in scripts/
+  python run.py nlm <command> [args...]   - run an nlm_* command (e.g. nlm query ask ...)
+
+Inside the skill venv the script runs in this same interpreter. Outside it,
+the runner replaces itself with the venv interpreter (os.execv) instead of
+starting a child process.
 """
 
 import os
@@ -9,11 +17,25 @@ import sys
 import subprocess
 from pathlib import Path
 
+SKILL_DIR = Path(__file__).parent.parent
+SCRIPTS_DIR = SKILL_DIR / "scripts"
+
+# `nlm <command>` → module in scripts/ (imported lazily, only the one requested)
+NLM_COMMANDS = {
+    "auth": "nlm_auth",
+    "notebook": "nlm_notebook",
+    "sources": "nlm_sources",
+    "query": "nlm_query",
+    "studio": "nlm_studio",
+    "workflow": "nlm_workflow",
+    "obsidian": "nlm_obsidian",
+    "daemon": "nlm_daemon",
+}
+
 
 def get_venv_python():
     """Get the virtual environment Python executable"""
-    skill_dir = Path(__file__).parent.parent
-    venv_dir = skill_dir / ".venv"
+    venv_dir = SKILL_DIR / ".venv"
 
     if os.name == 'nt':  # Windows
         venv_python = venv_dir / "Scripts" / "python.exe"
@@ -25,9 +47,8 @@ def get_venv_python():
 
 def ensure_venv():
     """Ensure virtual environment exists"""
-    skill_dir = Path(__file__).parent.parent
-    venv_dir = skill_dir / ".venv"
-    setup_script = skill_dir / "scripts" / "setup_environment.py"
+    venv_dir = SKILL_DIR / ".venv"
+    setup_script = SCRIPTS_DIR / "setup_environment.py"
 
     # Check if venv exists
     if not venv_dir.exists():
@@ -45,20 +66,91 @@ def ensure_venv():
     return get_venv_python()
 
 
-def main():
-    """Main runner"""
-    if len(sys.argv) < 2:
-        print("Usage: python run.py <script_name> [args...]")
-        print("\nAvailable scripts:")
-        print("  ask_question.py    - Query NotebookLM")
-        print("  notebook_manager.py - Manage notebook library")
-        print("  session_manager.py  - Manage sessions")
-        print("  auth_manager.py     - Handle authentication")
-        print("  cleanup_manager.py  - Clean up skill data")
+def in_skill_venv():
+    """Check if this interpreter is the skill's venv"""
+    return Path(sys.prefix).resolve() == (SKILL_DIR / ".venv").resolve()
+
+
+def exec_in_venv(argv):
+    """Replace the current process with the venv interpreter running argv"""
+    venv_python = str(ensure_venv())
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+    if os.name == 'nt':
+        # execv on Windows spawns a detached process; keep a plain child there
+        sys.exit(subprocess.run([venv_python] + argv).returncode)
+
+    try:
+        os.execv(venv_python, [venv_python] + argv)
+    except OSError as e:
+        print(f"❌ Error: {e}")
         sys.exit(1)
 
-    script_name = sys.argv[1]
-    script_args = sys.argv[2:]
+
+def ensure_stamp():
+    """Inside the venv: reinstall dependencies only if the env stamp mismatches"""
+    from env_stamp import stamp_is_current
+    if stamp_is_current():
+        return
+
+    print("📦 requirements.txt or Python changed, updating environment...")
+    from setup_environment import SkillEnvironment
+    if not SkillEnvironment().ensure_venv(force=True):
+        # The venv exists (we are running in it): keep using it rather than failing
+        # every command when offline or the package index is down. No stamp is
+        # written, so the update is retried on the next run.
+        print("⚠️  Could not update the environment, continuing with the existing one")
+
+
+def dispatch_nlm(command, args):
+    """Import the module for an nlm command and call its main() in-process"""
+    if str(SCRIPTS_DIR) not in sys.path:
+        sys.path.insert(0, str(SCRIPTS_DIR))
+
+    import importlib
+    module = importlib.import_module(NLM_COMMANDS[command])
+    sys.argv = [module.__file__] + args
+    return module.main()
+
+
+def dispatch_script(script_path, args):
+    """Run a script file as __main__ in this interpreter"""
+    if str(SCRIPTS_DIR) not in sys.path:
+        sys.path.insert(0, str(SCRIPTS_DIR))
+
+    import runpy
+    sys.argv = [str(script_path)] + args
+    runpy.run_path(str(script_path), run_name="__main__")
+
+
+def print_usage():
+    print("Usage: python run.py <script_name> [args...]")
+    print("       python run.py nlm <command> [args...]")
+    print("\nnlm commands:")
+    for command, module in NLM_COMMANDS.items():
+        print(f"  {command:<10} - {module}.py")
+    print("\nAvailable scripts:")
+    print("  ask_question.py    - Query NotebookLM")
+    print("  notebook_manager.py - Manage notebook library")
+    print("  session_manager.py  - Manage sessions")
+    print("  auth_manager.py     - Handle authentication")
+    print("  cleanup_manager.py  - Clean up skill data")
+
+
+def run(argv):
+    """Resolve argv to a script and run it in the venv. Returns an exit code."""
+    if argv[0] == "nlm":
+        if len(argv) < 2 or argv[1] not in NLM_COMMANDS:
+            print_usage()
+            return 1
+        if not in_skill_venv():
+            exec_in_venv([str(Path(__file__).resolve())] + argv)
+        ensure_stamp()
+        return dispatch_nlm(argv[1], argv[2:]) or 0
+
+    script_name = argv[0]
+    script_args = argv[1:]
 
     # Handle both "scripts/script.py" and "script.py" formats
     if script_name.startswith('scripts/'):
@@ -70,33 +162,36 @@ def main():
         script_name += '.py'
 
     # Get script path
-    skill_dir = Path(__file__).parent.parent
-    script_path = skill_dir / "scripts" / script_name
+    script_path = SCRIPTS_DIR / script_name
 
     if not script_path.exists():
         print(f"❌ Script not found: {script_name}")
         print(f"   Working directory: {Path.cwd()}")
-        print(f"   Skill directory: {skill_dir}")
+        print(f"   Skill directory: {SKILL_DIR}")
         print(f"   Looked for: {script_path}")
-        sys.exit(1)
+        return 1
 
-    # Ensure venv exists and get Python executable
-    venv_python = ensure_venv()
+    if not in_skill_venv():
+        # Re-exec the runner (not the script) so the env stamp is checked in the venv
+        exec_in_venv([str(Path(__file__).resolve())] + argv)
 
-    # Build command
-    cmd = [str(venv_python), str(script_path)] + script_args
+    ensure_stamp()
+    dispatch_script(script_path, script_args)
+    return 0
+
+
+def main():
+    """Main runner"""
+    if len(sys.argv) < 2:
+        print_usage()
+        sys.exit(1)
 
-    # Run the script
     try:
-        result = subprocess.run(cmd)
-        sys.exit(result.returncode)
+        sys.exit(run(sys.argv[1:]))
     except KeyboardInterrupt:
         print("\n⚠️ Interrupted by user")
         sys.exit(130)
-    except Exception as e:
-        print(f"❌ Error: {e}")
-        sys.exit(1)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -10,6 +10,8 @@ import subprocess
 import venv
 from pathlib import Path
 
+from env_stamp import stamp_is_current, read_stamp, write_stamp
+
 
 class SkillEnvironment:
     """Manages skill-specific virtual environment"""
@@ -28,16 +30,18 @@ class SkillEnvironment:
             self.venv_python = self.venv_dir / "bin" / "python"
             self.venv_pip = self.venv_dir / "bin" / "pip"
 
-    def ensure_venv(self) -> bool:
+    def ensure_venv(self, force: bool = False) -> bool:
         """Ensure virtual environment exists and is set up"""
 
-        # Check if we're already in the correct venv
-        if self.is_in_skill_venv():
-            print("✅ Already running in skill virtual environment")
+        # Stamp matches requirements.txt and interpreter: nothing to do
+        if not force and self.venv_dir.exists() and stamp_is_current():
+            if self.is_in_skill_venv():
+                print("✅ Already running in skill virtual environment")
             return True
 
         # Create venv if it doesn't exist
-        if not self.venv_dir.exists():
+        fresh = not self.venv_dir.exists()
+        if fresh:
             print(f"🔧 Creating virtual environment in {self.venv_dir.name}/")
             try:
                 venv.create(self.venv_dir, with_pip=True)
@@ -51,12 +55,13 @@ class SkillEnvironment:
             print("📦 Installing dependencies...")
             try:
                 # Upgrade pip first
-                subprocess.run(
-                    [str(self.venv_pip), "install", "--upgrade", "pip"],
-                    check=True,
-                    capture_output=True,
-                    text=True
-                )
+                if fresh:
+                    subprocess.run(
+                        [str(self.venv_pip), "install", "--upgrade", "pip"],
+                        check=True,
+                        capture_output=True,
+                        text=True
+                    )
 
                 # Install requirements
                 result = subprocess.run(
@@ -70,20 +75,26 @@ class SkillEnvironment:
                 # Install Chrome for Patchright (not Chromium!)
                 # Using real Chrome ensures cross-platform reliability and consistent browser fingerprinting
                 # See: https://github.com/Kaliiiiiiiiii-Vinyzu/patchright-python#anti-detection
-                print("🌐 Installing Google Chrome for Patchright...")
-                try:
-                    subprocess.run(
-                        [str(self.venv_python), "-m", "patchright", "install", "chrome"],
-                        check=True,
-                        capture_output=True,
-                        text=True
-                    )
-                    print("✅ Chrome installed")
-                except subprocess.CalledProcessError as e:
-                    print(f"⚠️ Warning: Failed to install Chrome: {e}")
-                    print("   You may need to run manually: python -m patchright install chrome")
-                    print("   Chrome is required (not Chromium) for reliability!")
-
+                stamp = read_stamp()
+                browser_installed = bool(stamp and stamp["browser"])
+                if not browser_installed:
+                    print("🌐 Installing Google Chrome for Patchright...")
+                    try:
+                        subprocess.run(
+                            [str(self.venv_python), "-m", "patchright", "install", "chrome"],
+                            check=True,
+                            capture_output=True,
+                            text=True
+                        )
+                        browser_installed = True
+                        print("✅ Chrome installed")
+                    except subprocess.CalledProcessError as e:
+                        print(f"⚠️ Warning: Failed to install Chrome: {e}")
+                        print("   You may need to run manually: python -m patchright install chrome")
+                        print("   Chrome is required (not Chromium) for reliability!")
+
+                # Next runs skip all of this until requirements.txt or Python change
+                write_stamp(browser_installed)
                 return True
             except subprocess.CalledProcessError as e:
                 print(f"❌ Failed to install dependencies: {e}")
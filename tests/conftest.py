@@ -0,0 +1,62 @@
+"""
+Fixtures comunes: los scripts nlm_* contra el backend falso (nlm_fake), sin
+red ni daemon, con estado y datos en un directorio temporal.
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+SCRIPTS_DIR = Path(__file__).parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+
+@pytest.fixture
+def fake_env(tmp_path, monkeypatch):
+    """Entorno del backend falso con dos notebooks de ejemplo."""
+    env = {
+        "NLM_FAKE_BACKEND": "1",
+        "NLM_FAKE_STATE": str(tmp_path / "fake.json"),
+        "NLM_FAKE_NOTEBOOKS": "2",
+        "NLM_FAKE_SEED": "0",
+        "NLM_DATA_DIR": str(tmp_path / "data"),
+        "NLM_NO_DAEMON": "1",
+        "NLM_LIMITS": "off",
+        "HOME": str(tmp_path / "home"),
+    }
+    for key, value in env.items():
+        monkeypatch.setenv(key, value)
+    return env
+
+
+@pytest.fixture
+def run_script(fake_env):
+    """Ejecuta scripts/<script> con el backend falso; falla si sale con error."""
+    def _run(script: str, *args: str) -> str:
+        proc = subprocess.run([sys.executable, str(SCRIPTS_DIR / script), *args],
+                              capture_output=True, text=True, env={**os.environ, **fake_env},
+                              timeout=120)
+        assert proc.returncode == 0, proc.stderr
+        return proc.stdout
+    return _run
+
+
+@pytest.fixture
+def fake_state(fake_env):
+    """Lee el estado persistido del backend falso."""
+    return lambda: json.loads(Path(fake_env["NLM_FAKE_STATE"]).read_text())
+
+
+@pytest.fixture
+def store_db(tmp_path, monkeypatch):
+    """nlm_store sobre una base temporal (conexión nueva para cada test)."""
+    import nlm_store
+    monkeypatch.setattr(nlm_store, "DB_FILE", tmp_path / "nlm_state.db")
+    monkeypatch.setattr(nlm_store, "_conn", None)
+    yield nlm_store
+    if nlm_store._conn is not None:
+        nlm_store._conn.close()
@@ -0,0 +1,28 @@
+"""configure y ask --persona con el backend falso."""
+
+
+def _first_notebook(run_script, fake_state) -> str:
+    run_script("nlm_notebook.py", "list")
+    return next(iter(fake_state()["notebooks"]))
+
+
+def test_configure_then_ask_with_persona(run_script, fake_state):
+    notebook_id = _first_notebook(run_script, fake_state)
+
+    out = run_script("nlm_query.py", "configure", "--id", notebook_id, "--goal", "learning")
+    assert 'CONFIGURADO: {"goal": "learning"}' in out
+    assert fake_state()["notebooks"][notebook_id]["config"] == {"goal": "LEARNING_GUIDE",
+                                                                "response_length": "DEFAULT"}
+
+    # Las opciones no indicadas conservan su valor registrado
+    out = run_script("nlm_query.py", "configure", "--id", notebook_id, "--length", "longer")
+    assert '"goal": "learning", "length": "longer"' in out
+
+    out = run_script("nlm_query.py", "ask", "--id", notebook_id, "--persona", "breve", "-q", "¿De qué trata?")
+    assert "RESPUESTA:" in out
+    assert fake_state()["notebooks"][notebook_id]["config"] == {"goal": "DEFAULT",
+                                                                "response_length": "SHORTER"}
+
+    # Misma persona: no vuelve a llamar a chat.configure
+    out = run_script("nlm_query.py", "configure", "--id", notebook_id, "--persona", "breve")
+    assert "SIN CAMBIOS" in out
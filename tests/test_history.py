@@ -0,0 +1,46 @@
+"""Sincronización incremental del espejo de historial (nlm_history)."""
+
+import asyncio
+from types import SimpleNamespace
+
+import nlm_history
+from nlm_fake import ConversationTurn
+
+
+class _HistoryClient:
+    """Cliente mínimo: chat.get_history devuelve `turns` en el orden dado."""
+
+    def __init__(self, turns):
+        self.turns = turns
+        self.chat = SimpleNamespace(get_history=self.get_history)
+
+    async def get_history(self, notebook_id: str, limit: int | None = None):
+        return self.turns[:limit] if limit else list(self.turns)
+
+
+def _turn(n: int) -> ConversationTurn:
+    return ConversationTurn(question=f"pregunta {n}", answer=f"respuesta {n}",
+                            conversation_id="c1", turn_number=n)
+
+
+def test_sync_keeps_new_turns_out_of_order(store_db):
+    client = _HistoryClient([_turn(1), _turn(2)])
+    assert asyncio.run(nlm_history.sync(client, "nb")) == 2
+
+    # Los nuevos llegan antes y después de los ya sincronizados, sin orden
+    client.turns = [_turn(4), _turn(1), _turn(3), _turn(2), _turn(5)]
+    assert asyncio.run(nlm_history.sync(client, "nb")) == 3
+    assert sorted(t["turn"] for t in nlm_history.iter_history("nb")) == [1, 2, 3, 4, 5]
+
+    assert asyncio.run(nlm_history.sync(client, "nb")) == 0
+    assert nlm_history.count("nb") == 5
+
+
+def test_sync_pages_back_until_a_known_turn(store_db, monkeypatch):
+    monkeypatch.setattr(nlm_history, "HISTORY_PAGE", 2)
+    client = _HistoryClient([_turn(1)])
+    asyncio.run(nlm_history.sync(client, "nb"))
+
+    client.turns = [_turn(n) for n in (6, 5, 4, 3, 2, 1)]
+    assert asyncio.run(nlm_history.sync(client, "nb")) == 5
+    assert nlm_history.count("nb") == 6